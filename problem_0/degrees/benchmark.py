@@ -0,0 +1,197 @@
+"""
+Benchmark harness for degrees.py.
+
+Generate a synthetic IMDb-shaped dataset:
+    python benchmark.py generate synthetic --people 100000
+
+Time a fixed set of queries against it:
+    python benchmark.py run synthetic --queries 100 --bidirectional
+"""
+
+import argparse
+import bisect
+import csv
+import itertools
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+
+import degrees
+from util import SearchStats
+
+
+def generate(directory, people_count, movies_per_person=0.5, seed=0):
+    """
+    Writes people.csv, movies.csv and stars.csv to directory in the same
+    format as the small and large datasets.
+
+    Cast sizes follow a power law, and stars are drawn with Zipf-like
+    popularity, so a few hub actors appear in a large share of movies.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    movie_count = max(1, int(people_count * movies_per_person))
+
+    with open(os.path.join(directory, "people.csv"), "w", encoding="utf-8",
+              newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        f.write("id,name,birth\n")
+        for person in range(people_count):
+            writer.writerow([person, f"Person {person}", rng.randint(1920, 2005)])
+
+    with open(os.path.join(directory, "movies.csv"), "w", encoding="utf-8",
+              newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        f.write("id,title,year\n")
+        for movie in range(movie_count):
+            writer.writerow([movie, f"Movie {movie}", rng.randint(1930, 2020)])
+
+    # everyone gets one credit in a random movie
+    casts = [set() for _ in range(movie_count)]
+    for person in range(people_count):
+        casts[rng.randrange(movie_count)].add(person)
+
+    # popularity of person i falls off as 1 / (i + 1)
+    cumulative = list(itertools.accumulate(1 / (person + 1) for person in range(people_count)))
+    total = cumulative[-1]
+
+    with open(os.path.join(directory, "stars.csv"), "w", encoding="utf-8",
+              newline="") as f:
+        f.write("person_id,movie_id\n")
+        for movie, cast in enumerate(casts):
+            # fill up to a power-law cast size with popular people
+            cast_size = min(people_count, int(rng.paretovariate(1.5)) + 1, 200)
+            while len(cast) < cast_size:
+                cast.add(bisect.bisect_left(cumulative, rng.random() * total))
+            f.writelines(f"{person},{movie}\n" for person in cast)
+
+
+def run(directory, queries=100, seed=0, bidirectional=False, load_options=None,
+        landmarks=0):
+    """
+    Loads the dataset in directory, passing load_options to degrees.load_data,
+    and times queries random pairs of people. Returns a report holding the
+    load time and, for each query, the degrees found, people expanded, peak
+    frontier size, wall time and RSS.
+    """
+    started = time.perf_counter()
+    degrees.load_data(directory, **(load_options or {}))
+    if landmarks:
+        degrees.load_landmarks(directory, landmarks)
+    load_seconds = time.perf_counter() - started
+
+    # both backends list people in sorted ID order, so a seed picks the same pairs
+    person_ids = list(degrees.graph.person_ids if degrees.graph is not None
+                      else sorted(degrees.people))
+    rng = random.Random(seed)
+    pairs = [(rng.choice(person_ids), rng.choice(person_ids)) for _ in range(queries)]
+
+    results = []
+    for source, target in pairs:
+        stats = SearchStats()
+        started = time.perf_counter()
+        path = degrees.shortest_path(source, target, bidirectional, stats)
+        seconds = time.perf_counter() - started
+        results.append({
+            "source": source,
+            "target": target,
+            "degrees": None if path is None else len(path),
+            "expanded": stats.expanded,
+            "frontier_peak": stats.frontier_peak,
+            "seconds": seconds,
+            "rss_bytes": rss_bytes(),
+        })
+
+    times = [result["seconds"] for result in results]
+    return {
+        "directory": directory,
+        "bidirectional": bidirectional,
+        "load_options": load_options or {},
+        "landmarks": landmarks,
+        "load_seconds": load_seconds,
+        "queries": results,
+        "summary": {
+            "median_seconds": statistics.median(times) if times else None,
+            "total_seconds": sum(times),
+            "total_expanded": sum(result["expanded"] for result in results),
+            "peak_rss_bytes": peak_rss_bytes(),
+        },
+    }
+
+
+def rss_bytes():
+    """
+    Returns the current resident set size of this process,
+    or the peak size where the current one is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    """Returns the peak resident set size of this process."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark degrees.py.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = commands.add_parser("generate", help="write a synthetic dataset")
+    generate_parser.add_argument("directory")
+    generate_parser.add_argument("--people", type=int, default=10000)
+    generate_parser.add_argument("--movies-per-person", type=float, default=0.5)
+    generate_parser.add_argument("--seed", type=int, default=0)
+
+    run_parser = commands.add_parser("run", help="time queries against a dataset")
+    run_parser.add_argument("directory")
+    run_parser.add_argument("--queries", type=int, default=100)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--bidirectional", action="store_true")
+    run_parser.add_argument("--compact", action="store_true")
+    run_parser.add_argument("--lazy", action="store_true")
+    run_parser.add_argument("--cache", action="store_true")
+    run_parser.add_argument("--landmarks", metavar="K", type=int, default=0)
+    run_parser.add_argument("--output", metavar="FILE",
+                            help="write the JSON report to FILE instead of stdout")
+
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate(args.directory, args.people, args.movies_per_person, args.seed)
+        return
+
+    load_options = {
+        "compact": args.compact or args.landmarks > 0,
+        "lazy": args.lazy,
+        "cache": args.cache,
+    }
+    report = run(args.directory, args.queries, args.seed, args.bidirectional,
+                 load_options, args.landmarks)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    summary = report["summary"]
+    median = summary["median_seconds"] or 0
+    print(f"{len(report['queries'])} queries, load {report['load_seconds']:.2f}s, "
+          f"median {median:.6f}s, "
+          f"{summary['total_expanded']} expanded, "
+          f"peak RSS {summary['peak_rss_bytes'] / 2 ** 20:.1f} MiB", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,18 @@
+import argparse
 import csv
+import json
+import math
+import multiprocessing
+import random
 import sys
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
 
-from util import Node, StackFrontier, QueueFrontier
+import records
+import snapshot
+from landmarks import LandmarkIndex
+from util import LRUCache, Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,11 +23,63 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact integer-indexed star graph, used instead of the sets above when loaded
+graph = None
 
-def load_data(directory):
+# Landmark distances over graph, used to bound and guide searches when loaded
+landmark_index = None
+
+# Recently expanded neighbor sets, used by neighbors_for_person when enabled
+neighbor_cache = None
+
+# Binary snapshot of the parsed data, kept in the data directory
+SNAPSHOT_FILE = "degrees.snapshot"
+
+# Saved landmark index, kept in the data directory
+LANDMARKS_FILE = "degrees.landmarks"
+
+
+def load_data(directory, compact=False, cache=False, lazy=False):
     """
     Load data from CSV files into memory.
+
+    If compact is True, the CSV files are streamed straight into a
+    CompactGraph, and people and movies keep their other columns packed
+    into string tables.
+
+    If lazy is True, the graph is built the same way, and people and
+    movies read each record from disk on access instead.
+
+    If cache is True, the compact graph, names and records are all
+    memory-mapped from a snapshot in the directory, which is rewritten
+    whenever the CSV files change.
+    """
+    global graph, names, people, movies
+
+    if cache:
+        snapshot_path = f"{directory}/{SNAPSHOT_FILE}"
+        sources = data_fingerprint(directory)
+        loaded = snapshot.load(snapshot_path, sources)
+        if loaded is not None and loaded[1]["lazy"] == lazy:
+            graph, names, people, movies = records.from_arrays(*loaded)
+            return
+
+    if compact or lazy or cache:
+        graph, names, people, movies = records.load_csv(directory, lazy)
+    else:
+        _load_dicts(directory)
+
+    # Save what was parsed so the next start can skip the CSV files
+    if cache:
+        snapshot.save(snapshot_path, sources,
+                      *records.to_arrays(graph, names, people, movies))
+
+
+def _load_dicts(directory):
+    """
+    Load the CSV files into names, people and movies.
     """
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -52,15 +115,129 @@ def load_data(directory):
                 pass
 
 
+def load_landmarks(directory, k=16):
+    """
+    Loads the landmark index for the compact graph from the data directory,
+    building and saving it first if it is missing or the CSV files changed.
+    """
+    global landmark_index
+
+    path = f"{directory}/{LANDMARKS_FILE}"
+    sources = data_fingerprint(directory)
+    landmark_index = LandmarkIndex.load(graph, path, sources)
+    if landmark_index is None or len(landmark_index.landmarks) != k:
+        landmark_index = LandmarkIndex.build(graph, k)
+        landmark_index.save(path, sources)
+
+
+def enable_neighbor_cache(max_entries=None, max_bytes=None):
+    """
+    Caches the neighbors of recently expanded people, evicting the least
+    recently used once there are more than max_entries people cached or
+    the cached neighbors take more than max_bytes bytes.
+    """
+    global neighbor_cache
+    neighbor_cache = LRUCache(max_entries, max_bytes, sizeof=_neighbors_size)
+
+    # compact searches expand people through the graph, keyed by index
+    if graph is not None:
+        graph.cache = neighbor_cache
+
+
+def neighbor_cache_info():
+    """
+    Returns the neighbor cache hit and miss counters and size,
+    or None if the cache is not enabled.
+    """
+    return None if neighbor_cache is None else neighbor_cache.info()
+
+
+def _neighbors_size(neighbors):
+    # the set or tuple itself plus one (movie, person) tuple per neighbor
+    return sys.getsizeof(neighbors) + len(neighbors) * sys.getsizeof((None, None))
+
+
+def data_fingerprint(directory):
+    """
+    Returns the fingerprint of the CSV files in directory.
+    """
+    return snapshot.fingerprint([
+        f"{directory}/{name}.csv" for name in ("people", "movies", "stars")
+    ])
+
+
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(description="Degrees of separation.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--compact", action="store_true",
+                        help="store the star graph as integer arrays")
+    parser.add_argument("--lazy", action="store_true",
+                        help="stream the CSV files into integer arrays and "
+                             "read names and titles from disk when printed")
+    parser.add_argument("--cache", action="store_true",
+                        help="load from and save to a binary snapshot")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="search from both people at once")
+    parser.add_argument("--landmarks", metavar="K", type=int, default=0,
+                        help="guide searches with K landmark people")
+    parser.add_argument("--neighbor-cache", metavar="N", type=int,
+                        help="cache the neighbors of the N most recently "
+                             "expanded people")
+    parser.add_argument("--histogram", metavar="SAMPLES", type=int,
+                        help="print the degrees of separation from SAMPLES "
+                             "random people to everyone else as JSON")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="answer tab-separated name pairs from FILE "
+                             "('-' for stdin) as JSON lines")
+    parser.add_argument("--serve", metavar="PORT", type=int,
+                        help="answer queries over HTTP on PORT")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="address to serve on (default: 127.0.0.1)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes answering batch queries, sharing compact "
+                             "data (default: 1)")
+    args = parser.parse_args()
+
+    # Keep standard output clean for the JSON lines in batch mode
+    log = sys.stderr if args.batch or args.serve else sys.stdout
 
     # Load data from files into memory
-    print("Loading data...")
-    load_data(directory)
-    print("Data loaded.")
+    print("Loading data...", file=log)
+    load_data(args.directory,
+              compact=args.compact or args.landmarks > 0 or args.workers > 1,
+              cache=args.cache, lazy=args.lazy)
+    if args.landmarks > 0:
+        load_landmarks(args.directory, args.landmarks)
+    if args.neighbor_cache:
+        enable_neighbor_cache(max_entries=args.neighbor_cache)
+    print("Data loaded.", file=log)
+
+    if args.histogram:
+        histogram = degree_histogram(args.histogram)
+        print(json.dumps({
+            ("not connected" if distance is None else str(distance)): count
+            for distance, count in sorted(
+                histogram.items(), key=lambda item: (item[0] is None, item[0] or 0)
+            )
+        }))
+        return
+
+    if args.batch:
+        if args.batch == "-":
+            run_batch(sys.stdin, sys.stdout, args.bidirectional, args.workers)
+        else:
+            with open(args.batch, encoding="utf-8") as f:
+                run_batch(f, sys.stdout, args.bidirectional, args.workers)
+        # each worker fills its own copy of the cache, so only report it
+        # when the queries were answered in this process
+        if neighbor_cache is not None and args.workers <= 1:
+            print(f"Neighbor cache: {neighbor_cache_info()}", file=log)
+        return
+
+    if args.serve:
+        print(f"Serving on http://{args.host}:{args.serve}/path", file=log)
+        serve(args.host, args.serve, args.bidirectional)
+        return
 
     source = person_id_for_name(input("Name: "))
     if source is None:
@@ -69,7 +246,7 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path = shortest_path(source, target, args.bidirectional)
 
     if path is None:
         print("Not connected.")
@@ -84,13 +261,32 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, bidirectional=False, stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
     If no possible path, returns None.
+
+    If bidirectional is True, the search expands from both ends at
+    once instead of only from the source. If stats is a util.SearchStats,
+    the work done by the search is recorded in it.
     """
+    if graph is not None:
+        source_index = graph.person(source)
+        target_index = graph.person(target)
+        if landmark_index is not None and not bidirectional:
+            path = landmark_index.shortest_path(source_index, target_index, stats)
+        else:
+            path = graph.shortest_path(source_index, target_index, bidirectional,
+                                       stats)
+        return None if path is None else graph.path_ids(path)
+    if bidirectional:
+        return bidirectional_shortest_path(source, target, stats)
+
+    # nothing to connect if both people are the same, as on every other backend
+    if source == target:
+        return []
 
     # start with frontier that contains the initial state
     start = Node(source, None, None)
@@ -111,6 +307,8 @@ def shortest_path(source, target):
 
         # remove a node from the frontier
         node = frontier.remove()
+        if stats is not None:
+            stats.expand(len(frontier))
 
         # add node to the explored set
         explored_set.add(node.state)
@@ -151,16 +349,189 @@ def shortest_path(source, target):
                 frontier.add(new_node)
 
 
+def degrees_apart(source, target):
+    """
+    Returns the number of degrees of separation between two people,
+    or None if they are not connected.
+
+    With a landmark index loaded, most answers come straight from the
+    landmark distance bounds without any search.
+    """
+    if landmark_index is not None:
+        lower, upper = landmark_index.bounds(
+            graph.person(source), graph.person(target)
+        )
+        if lower == upper:
+            return None if lower == math.inf else lower
+    path = shortest_path(source, target)
+    return None if path is None else len(path)
+
+
+def all_distances(source, max_depth=None):
+    """
+    Runs a single breadth-first search from source and returns
+    (distances, parents) for everyone reached within max_depth degrees:
+    distances maps each person_id to its degrees of separation, and
+    parents maps it to the (movie_id, person_id) pair it was first
+    reached through, or None for the source.
+    """
+    if graph is not None:
+        distance, parent, parent_movie = graph.breadth_first(
+            graph.person(source), max_depth
+        )
+        distances = {}
+        parents = {}
+        for person, steps in enumerate(distance):
+            if steps < 0:
+                continue
+            person_id = graph.person_ids[person]
+            distances[person_id] = steps
+            parents[person_id] = None if steps == 0 else (
+                graph.movie_ids[parent_movie[person]], graph.person_ids[parent[person]]
+            )
+        return distances, parents
+
+    distances = {source: 0}
+    parents = {source: None}
+    frontier = deque([source])
+    while frontier:
+        person_id = frontier.popleft()
+        steps = distances[person_id] + 1
+        if max_depth is not None and steps > max_depth:
+            break
+        for movie_id, neighbor_id in neighbors_for_person(person_id):
+            if neighbor_id not in distances:
+                distances[neighbor_id] = steps
+                parents[neighbor_id] = (movie_id, person_id)
+                frontier.append(neighbor_id)
+    return distances, parents
+
+
+def degree_histogram(samples, seed=None):
+    """
+    Estimates the distribution of degrees of separation by running one
+    breadth-first search from each of samples random people. Returns a
+    Counter from degrees to the number of (source, target) pairs that far
+    apart, with None counting pairs that are not connected.
+    """
+    # both backends list people in sorted ID order, so a seed picks the same sources
+    person_ids = graph.person_ids if graph is not None else sorted(people)
+    sources = random.Random(seed).sample(person_ids, min(samples, len(person_ids)))
+
+    histogram = Counter()
+    for source in sources:
+        if graph is not None:
+            # count straight from the distance array
+            counts = Counter(graph.distances(graph.person(source)))
+            unreachable = counts.pop(-1, 0)
+        else:
+            counts = Counter(all_distances(source)[0].values())
+            unreachable = len(person_ids) - sum(counts.values())
+        del counts[0]
+        histogram.update(counts)
+        if unreachable:
+            histogram[None] += unreachable
+    return histogram
+
+
+def bidirectional_shortest_path(source, target, stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching breadth-first
+    from both people and always growing the smaller frontier.
+
+    If no possible path, returns None.
+    """
+
+    # nothing to connect if both people are the same
+    if source == target:
+        return []
+
+    # each side maps a person to the (movie_id, person_id) it was reached through
+    forward_parents = {source: None}
+    backward_parents = {target: None}
+
+    # each frontier holds one full layer of the search
+    forward_frontier = deque([source])
+    backward_frontier = deque([target])
+
+    while forward_frontier and backward_frontier:
+
+        # expand the side with fewer people waiting
+        if len(forward_frontier) <= len(backward_frontier):
+            meeting = _expand_layer(forward_frontier, forward_parents,
+                                    backward_parents, stats)
+        else:
+            meeting = _expand_layer(backward_frontier, backward_parents,
+                                    forward_parents, stats)
+
+        # the first person seen by both sides lies on a shortest path
+        if meeting is not None:
+            return _join_paths(meeting, forward_parents, backward_parents)
+
+    # one side ran out of people, so the two are not connected
+    return None
 
-def person_id_for_name(name):
+
+def _expand_layer(frontier, parents, other_parents, stats):
+    """
+    Expands every person in the current layer of frontier, replacing it
+    with the next layer. Returns a person already reached by the other
+    side of the search, or None if the two sides have not met yet.
+    """
+    for _ in range(len(frontier)):
+        person_id = frontier.popleft()
+        if stats is not None:
+            stats.expand(len(frontier))
+        for movie_id, neighbor_id in neighbors_for_person(person_id):
+            if neighbor_id in parents:
+                continue
+            parents[neighbor_id] = (movie_id, person_id)
+            if neighbor_id in other_parents:
+                return neighbor_id
+            frontier.append(neighbor_id)
+    return None
+
+
+def _join_paths(meeting, forward_parents, backward_parents):
+    """
+    Joins the two halves of a bidirectional search that met at meeting
+    into a single list of (movie_id, person_id) pairs.
+    """
+    path = []
+
+    # walk back from the meeting person to the source
+    person_id = meeting
+    while forward_parents[person_id] is not None:
+        movie_id, parent_id = forward_parents[person_id]
+        path.append((movie_id, person_id))
+        person_id = parent_id
+    path.reverse()
+
+    # walk forward from the meeting person to the target
+    person_id = meeting
+    while backward_parents[person_id] is not None:
+        movie_id, next_id = backward_parents[person_id]
+        path.append((movie_id, next_id))
+        person_id = next_id
+
+    return path
+
+
+def person_id_for_name(name, interactive=True):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    If interactive is False, ambiguous names return None
+    instead of prompting for an ID.
     """
     person_ids = list(names.get(name.lower(), set()))
     if len(person_ids) == 0:
         return None
     elif len(person_ids) > 1:
+        if not interactive:
+            return None
         print(f"Which '{name}'?")
         for person_id in person_ids:
             person = people[person_id]
@@ -182,7 +553,23 @@ def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
+
+    With the neighbor cache enabled, the pairs are returned
+    as a shared frozenset, or built from the index pairs the
+    compact graph keeps in the cache.
     """
+    if graph is not None:
+        return set(graph.path_ids(graph.neighbors(graph.person(person_id))))
+    if neighbor_cache is not None:
+        neighbors = neighbor_cache.get(person_id)
+        if neighbors is None:
+            neighbors = frozenset(_expand_person(person_id))
+            neighbor_cache.put(person_id, neighbors)
+        return neighbors
+    return _expand_person(person_id)
+
+
+def _expand_person(person_id):
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -191,5 +578,144 @@ def neighbors_for_person(person_id):
     return neighbors
 
 
+def answer_query(source_name, target_name, bidirectional=False):
+    """
+    Looks up two people by name and returns a JSON-ready dictionary with
+    the path between them, or with an error describing why there is none.
+    """
+    answer = {"source": source_name, "target": target_name}
+
+    # resolve both names without prompting
+    person_ids = []
+    for name in (source_name, target_name):
+        person_id = person_id_for_name(name, interactive=False)
+        if person_id is None:
+            if len(names.get(name.lower(), ())) > 1:
+                answer["error"] = f"Ambiguous name: {name}"
+            else:
+                answer["error"] = f"Person not found: {name}"
+            return answer
+        person_ids.append(person_id)
+
+    path = shortest_path(person_ids[0], person_ids[1], bidirectional)
+    if path is None:
+        answer["error"] = "Not connected."
+        return answer
+
+    answer["degrees"] = len(path)
+    answer["path"] = [
+        {
+            "movie_id": movie_id,
+            "title": movies[movie_id]["title"],
+            "person_id": person_id,
+            "name": people[person_id]["name"],
+        }
+        for movie_id, person_id in path
+    ]
+    return answer
+
+
+def answer_queries(pairs, bidirectional=False, workers=1):
+    """
+    Yields answer_query results for an iterable of (source_name, target_name)
+    pairs, in input order.
+
+    With more than one worker, the queries are spread over a pool of forked
+    processes that inherit the loaded data. Only the compact graph and its
+    string tables stay shared copy-on-write; the dict backend's sets are
+    copied page by page as the workers touch their reference counts, which
+    is why main loads compact data whenever it uses workers.
+    """
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        for source_name, target_name in pairs:
+            yield answer_query(source_name, target_name, bidirectional)
+        return
+
+    # forked workers inherit the loaded data instead of reloading or pickling it
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers) as pool:
+        yield from pool.imap(
+            _answer_pair, ((pair, bidirectional) for pair in pairs), chunksize=16
+        )
+
+
+def _answer_pair(task):
+    (source_name, target_name), bidirectional = task
+    return answer_query(source_name, target_name, bidirectional)
+
+
+def run_batch(lines, out, bidirectional=False, workers=1):
+    """
+    Answers one query per line of tab-separated source and target names,
+    writing each answer to out as a line of JSON, in input order.
+
+    Every query goes through a single answer_queries call, so one pool of
+    workers answers the whole batch and answers stream out while the input
+    is still being read.
+    """
+    # lines read but not yet written, with their pair of names or None
+    pending = deque()
+
+    def pairs():
+        for line in lines:
+            line = line.rstrip("\r\n")
+            if not line.strip():
+                continue
+            fields = line.split("\t")
+            pair = tuple(field.strip() for field in fields) if len(fields) == 2 else None
+            pending.append((line, pair))
+            if pair is not None:
+                yield pair
+
+    def write(answer):
+        out.write(json.dumps(answer) + "\n")
+        out.flush()
+
+    def write_malformed():
+        write({"line": pending.popleft()[0], "error": "Expected two tab-separated names."})
+
+    for answer in answer_queries(pairs(), bidirectional, workers):
+        # malformed lines read before this query come out first
+        while pending[0][1] is None:
+            write_malformed()
+        pending.popleft()
+        write(answer)
+    while pending:
+        write_malformed()
+
+
+def serve(host, port, bidirectional=False):
+    """
+    Answers GET /path?source=NAME&target=NAME requests with JSON
+    until interrupted, reusing the data already in memory.
+    """
+
+    class QueryHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = parse_qs(url.query)
+            if url.path != "/path" or "source" not in params or "target" not in params:
+                self.reply(400, {"error": "Use /path?source=NAME&target=NAME"})
+                return
+            answer = answer_query(params["source"][0], params["target"][0],
+                                  bidirectional)
+            self.reply(200, answer)
+
+        def reply(self, status, answer):
+            body = json.dumps(answer).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    with ThreadingHTTPServer((host, port), QueryHandler) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
 if __name__ == "__main__":
     main()
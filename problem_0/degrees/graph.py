@@ -0,0 +1,225 @@
+from array import array
+from collections import deque
+
+# Names of the CSR arrays, in the order the constructor takes them
+ARRAYS = ("person_offsets", "person_movies", "movie_offsets", "movie_stars")
+
+
+class CompactGraph():
+    """
+    Star graph with people and movies interned to dense integer indices.
+
+    person_ids and movie_ids are sorted records.StringTable objects, so the
+    index of an ID is its position in sorted order, found by binary search.
+
+    Movies each person starred in, and stars of each movie, are kept in
+    CSR form: the entries for person p are
+    person_movies[person_offsets[p]:person_offsets[p + 1]], and the same
+    layout is used for movie_stars.
+    """
+
+    def __init__(self, person_ids, movie_ids, person_offsets, person_movies,
+                 movie_offsets, movie_stars):
+        self.person_ids = person_ids
+        self.movie_ids = movie_ids
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+
+        # util.LRUCache of recently expanded neighbors, used when set
+        self.cache = None
+
+    def arrays(self):
+        """
+        Returns the CSR arrays by name, matching the constructor arguments.
+        """
+        return {name: getattr(self, name) for name in ARRAYS}
+
+    def __len__(self):
+        return len(self.person_ids)
+
+    def person(self, person_id):
+        """
+        Returns the index of the person with the given ID.
+        Raises KeyError if there is no such person.
+        """
+        person = self.person_ids.find(person_id)
+        if person is None:
+            raise KeyError(person_id)
+        return person
+
+    def neighbors(self, person):
+        """
+        Returns an iterable of (movie, person) index pairs for people
+        who starred with the person at the given index.
+
+        With a cache set, the pairs are kept in it as a shared tuple.
+        """
+        if self.cache is None:
+            return self._expand(person)
+        neighbors = self.cache.get(person)
+        if neighbors is None:
+            neighbors = tuple(self._expand(person))
+            self.cache.put(person, neighbors)
+        return neighbors
+
+    def _expand(self, person):
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+        for i in range(self.person_offsets[person], self.person_offsets[person + 1]):
+            movie = person_movies[i]
+            for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                yield movie, movie_stars[j]
+
+    def distances(self, source, max_depth=None):
+        """
+        Returns an array holding the degrees of separation from the source
+        index to every person, with -1 for people who cannot be reached.
+        """
+        return self.breadth_first(source, max_depth)[0]
+
+    def breadth_first(self, source, max_depth=None):
+        """
+        Runs one breadth-first search from the source index and returns
+        (distance, parent, parent_movie) arrays indexed by person.
+
+        distance holds the degrees of separation from the source, or -1 for
+        people not reached within max_depth degrees. parent and parent_movie
+        hold the person and movie each reached person was first reached
+        through, or -1 for the source and unreached people.
+        """
+        distance = array("i", [-1]) * len(self)
+        parent = array("i", [-1]) * len(self)
+        parent_movie = array("i", [-1]) * len(self)
+        distance[source] = 0
+
+        # every star of a movie is reached the first time the movie is seen
+        seen_movies = set()
+        frontier = deque([source])
+        while frontier:
+            person = frontier.popleft()
+            next_distance = distance[person] + 1
+            if max_depth is not None and next_distance > max_depth:
+                break
+            for i in range(self.person_offsets[person], self.person_offsets[person + 1]):
+                movie = self.person_movies[i]
+                if movie in seen_movies:
+                    continue
+                seen_movies.add(movie)
+                for j in range(self.movie_offsets[movie], self.movie_offsets[movie + 1]):
+                    neighbor = self.movie_stars[j]
+                    if distance[neighbor] < 0:
+                        distance[neighbor] = next_distance
+                        parent[neighbor] = person
+                        parent_movie[neighbor] = movie
+                        frontier.append(neighbor)
+        return distance, parent, parent_movie
+
+    def degree(self, person):
+        """
+        Returns the number of star credits shared with the person at the
+        given index, counting co-stars once per movie.
+        """
+        movie_offsets = self.movie_offsets
+        return sum(
+            movie_offsets[movie + 1] - movie_offsets[movie]
+            for movie in self.person_movies[
+                self.person_offsets[person]:self.person_offsets[person + 1]
+            ]
+        )
+
+    def path_ids(self, path):
+        """
+        Converts a list of (movie, person) index pairs
+        into (movie_id, person_id) pairs.
+        """
+        return [(self.movie_ids[movie], self.person_ids[person])
+                for movie, person in path]
+
+    def shortest_path(self, source, target, bidirectional=False, stats=None):
+        """
+        Returns the shortest list of (movie, person) index pairs
+        that connect the source index to the target index.
+
+        If no possible path, returns None. Work done is recorded in
+        stats, a util.SearchStats, if given.
+        """
+        if source == target:
+            return []
+        if bidirectional:
+            return self._bidirectional_path(source, target, stats)
+
+        # maps each reached person to the (movie, person) it was reached through
+        parents = {source: None}
+        frontier = deque([source])
+
+        while frontier:
+            person = frontier.popleft()
+            if stats is not None:
+                stats.expand(len(frontier))
+            for movie, neighbor in self.neighbors(person):
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = (movie, person)
+                if neighbor == target:
+                    return path_to(parents, target)
+                frontier.append(neighbor)
+
+        return None
+
+    def _bidirectional_path(self, source, target, stats):
+        """
+        Breadth-first search from both ends, always growing the smaller
+        frontier one full layer at a time.
+        """
+        forward_parents = {source: None}
+        backward_parents = {target: None}
+        forward_frontier = deque([source])
+        backward_frontier = deque([target])
+
+        while forward_frontier and backward_frontier:
+            if len(forward_frontier) <= len(backward_frontier):
+                meeting = self._expand_layer(forward_frontier, forward_parents,
+                                             backward_parents, stats)
+            else:
+                meeting = self._expand_layer(backward_frontier, backward_parents,
+                                             forward_parents, stats)
+            if meeting is not None:
+                path = path_to(forward_parents, meeting)
+                person = meeting
+                while backward_parents[person] is not None:
+                    movie, person = backward_parents[person]
+                    path.append((movie, person))
+                return path
+
+        return None
+
+    def _expand_layer(self, frontier, parents, other_parents, stats):
+        for _ in range(len(frontier)):
+            person = frontier.popleft()
+            if stats is not None:
+                stats.expand(len(frontier))
+            for movie, neighbor in self.neighbors(person):
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = (movie, person)
+                if neighbor in other_parents:
+                    return neighbor
+                frontier.append(neighbor)
+        return None
+
+
+def path_to(parents, person):
+    """
+    Follows parents back from person to the search root and returns
+    the (movie, person) pairs leading to it in order.
+    """
+    path = []
+    while parents[person] is not None:
+        movie, parent = parents[person]
+        path.append((movie, person))
+        person = parent
+    path.reverse()
+    return path
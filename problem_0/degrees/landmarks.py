@@ -0,0 +1,135 @@
+import heapq
+import math
+from array import array
+
+import snapshot
+from graph import path_to
+
+
+class LandmarkIndex():
+    """
+    Degrees of separation from a few well-connected landmark people to
+    everyone else in a CompactGraph.
+
+    By the triangle inequality, for any landmark l the distance between
+    s and t is at least |d(l, s) - d(l, t)| and at most d(l, s) + d(l, t).
+    """
+
+    def __init__(self, graph, landmarks, distances):
+        self.graph = graph
+        self.landmarks = landmarks
+        self.distances = distances
+
+    @classmethod
+    def build(cls, graph, k=16):
+        """
+        Picks the k people with the most co-star credits as landmarks
+        and runs one breadth-first search from each.
+        """
+        landmarks = array("i", heapq.nlargest(k, range(len(graph)), key=graph.degree))
+        distances = [graph.distances(landmark) for landmark in landmarks]
+        return cls(graph, landmarks, distances)
+
+    @classmethod
+    def load(cls, graph, path, sources):
+        """
+        Returns the index saved at path for graph, or None if it is missing
+        or was built from different source files.
+        """
+        loaded = snapshot.load(path, sources)
+        if loaded is None:
+            return None
+        arrays, size = loaded
+        if size != len(graph):
+            return None
+        landmarks = arrays["landmarks"]
+        table = arrays["distances"]
+        distances = [table[i * size:(i + 1) * size] for i in range(len(landmarks))]
+        return cls(graph, landmarks, distances)
+
+    def save(self, path, sources):
+        """
+        Writes the index to path, tagged with the fingerprint of the
+        source files it was built from.
+        """
+        table = array("i")
+        for distance in self.distances:
+            table.extend(distance)
+        snapshot.save(path, sources,
+                      {"landmarks": array("i", self.landmarks), "distances": table},
+                      len(self.graph))
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper) bounds on the degrees of separation between
+        the source and target indices. Both are math.inf when a landmark
+        shows the two are not connected; upper is math.inf when no
+        landmark reaches either of them.
+        """
+        lower = 0
+        upper = math.inf
+        for distance in self.distances:
+            source_distance = distance[source]
+            target_distance = distance[target]
+            if source_distance < 0 and target_distance < 0:
+                continue
+            if source_distance < 0 or target_distance < 0:
+                return math.inf, math.inf
+            lower = max(lower, abs(source_distance - target_distance))
+            upper = min(upper, source_distance + target_distance)
+        return lower, upper
+
+    def shortest_path(self, source, target, stats=None):
+        """
+        Returns the shortest list of (movie, person) index pairs that
+        connect the source index to the target index, using A* search
+        with the landmark lower bound as the heuristic.
+
+        If no possible path, returns None. Work done is recorded in
+        stats, a util.SearchStats, if given.
+        """
+        if source == target:
+            return []
+        lower, upper = self.bounds(source, target)
+        if lower == math.inf:
+            return None
+
+        graph = self.graph
+        target_distances = [distance[target] for distance in self.distances]
+
+        def estimate(person):
+            # a landmark that misses person but reaches target rules it out
+            best = 0
+            for distance, target_distance in zip(self.distances, target_distances):
+                person_distance = distance[person]
+                if (person_distance < 0) != (target_distance < 0):
+                    return math.inf
+                best = max(best, abs(person_distance - target_distance))
+            return best
+
+        # the heuristic is consistent, so a person is final once popped
+        parents = {source: None}
+        cost = {source: 0}
+        frontier = [(lower, 0, source)]
+        while frontier:
+            _, steps, person = heapq.heappop(frontier)
+            if steps > cost[person]:
+                continue
+            if stats is not None:
+                stats.expand(len(frontier))
+            if person == target:
+                return path_to(parents, target)
+            for movie, neighbor in graph.neighbors(person):
+                if neighbor in cost and cost[neighbor] <= steps + 1:
+                    continue
+                priority = steps + 1 + estimate(neighbor)
+
+                # skip people who cannot beat the landmark upper bound
+                if priority > upper:
+                    continue
+                cost[neighbor] = steps + 1
+                parents[neighbor] = (movie, person)
+                heapq.heappush(frontier, (priority, steps + 1, neighbor))
+
+        return None
+
@@ -0,0 +1,386 @@
+import csv
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping, Sequence
+
+from graph import ARRAYS, CompactGraph
+
+
+class StringTable(Sequence):
+    """
+    Read-only sequence of strings stored back to back in one UTF-8 blob,
+    where string i spans the bytes blob[offsets[i]:offsets[i + 1]].
+
+    The blob and offsets can be memory-mapped straight from a snapshot.
+    Tables built sorted can also be searched with find and bounds.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, strings):
+        """Packs an iterable of strings into a new table."""
+        offsets = array("q", [0])
+        parts = []
+        size = 0
+        for string in strings:
+            data = string.encode("utf-8")
+            parts.append(data)
+            size += len(data)
+            offsets.append(size)
+        return cls(array("B", b"".join(parts)), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __iter__(self):
+        blob = self.blob
+        offsets = self.offsets
+        for i in range(len(self)):
+            yield str(blob[offsets[i]:offsets[i + 1]], "utf-8")
+
+    def raw(self, i):
+        """Returns string i as bytes, which sort the same way as the strings."""
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]])
+
+    def bounds(self, string):
+        """
+        Returns (start, end) such that the entries of a sorted table equal
+        to string are the ones with indices in range(start, end).
+        """
+        key = string.encode("utf-8")
+        indices = range(len(self))
+        return (bisect_left(indices, key, key=self.raw),
+                bisect_right(indices, key, key=self.raw))
+
+    def find(self, string):
+        """Returns the index of string in a sorted table, or None if it is missing."""
+        key = string.encode("utf-8")
+        i = bisect_left(range(len(self)), key, key=self.raw)
+        if i < len(self) and self.raw(i) == key:
+            return i
+        return None
+
+
+class NameIndex(Mapping):
+    """
+    Read-only mapping from lowercase names to sets of person_ids.
+
+    names is a sorted StringTable holding every person's lowercase name,
+    and people holds the index into person_ids of each name's person.
+    """
+
+    def __init__(self, names, people, person_ids):
+        self.names = names
+        self.people = people
+        self.person_ids = person_ids
+
+    @classmethod
+    def build(cls, names, person_ids):
+        """
+        Builds the index from a list holding the name of each person,
+        in the same order as person_ids.
+        """
+        lowered = [name.lower() for name in names]
+        order = sorted(range(len(lowered)), key=lowered.__getitem__)
+        return cls(StringTable.build(lowered[i] for i in order), array("i", order),
+                   person_ids)
+
+    def __getitem__(self, name):
+        start, end = self.names.bounds(name)
+        if start == end:
+            raise KeyError(name)
+        return {self.person_ids[self.people[i]] for i in range(start, end)}
+
+    def __contains__(self, name):
+        start, end = self.names.bounds(name)
+        return start < end
+
+    def __iter__(self):
+        previous = None
+        for name in self.names:
+            if name != previous:
+                yield name
+            previous = name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class TableRecords(Mapping):
+    """
+    Read-only mapping from IDs to the other columns of their CSV row,
+    held in memory as one StringTable per column.
+
+    ids is the sorted StringTable of IDs, and row i of each column
+    belongs to ids[i].
+    """
+
+    def __init__(self, ids, fields, columns):
+        self.ids = ids
+        self.fields = fields
+        self.columns = columns
+
+    def __getitem__(self, key):
+        i = self.ids.find(key)
+        if i is None:
+            raise KeyError(key)
+        return {field: column[i] for field, column in zip(self.fields, self.columns)}
+
+    def __contains__(self, key):
+        return self.ids.find(key) is not None
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class LazyRecords(Mapping):
+    """
+    Read-only mapping from IDs to the other columns of their CSV row,
+    read from disk on each access.
+
+    ids is the sorted StringTable of IDs, rows[i] is the row number of
+    ids[i] in the file, and row r spans the bytes lines[r]:lines[r + 1].
+    """
+
+    def __init__(self, path, fields, ids, rows, lines):
+        self.path = path
+        self.fields = fields
+        self.ids = ids
+        self.rows = rows
+        self.lines = lines
+
+    def __getitem__(self, key):
+        i = self.ids.find(key)
+        if i is None:
+            raise KeyError(key)
+        row = self.rows[i]
+        with open(self.path, "rb") as f:
+            f.seek(self.lines[row])
+            data = f.read(self.lines[row + 1] - self.lines[row])
+        row = next(csv.reader([data.decode("utf-8")]))
+        return dict(zip(self.fields, row[1:]))
+
+    def __contains__(self, key):
+        return self.ids.find(key) is not None
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def load_csv(directory, lazy=True):
+    """
+    Streams the CSV files in directory into a CompactGraph, numbering
+    people and movies in sorted order of their IDs.
+
+    Returns (graph, names, people, movies), where names is a NameIndex.
+    If lazy is True, people and movies are LazyRecords that keep only the
+    byte offset of each row; otherwise they are TableRecords that keep the
+    other columns packed in memory.
+    """
+    directory = os.path.abspath(directory)
+
+    # Index people, keeping their names for the name index
+    people_path = os.path.join(directory, "people.csv")
+    person_ids, people_fields, people_rows, people_lines, people_columns = _load_table(
+        people_path, columns=not lazy, names=True
+    )
+    names = NameIndex.build(people_columns.pop(), person_ids)
+
+    # Index movies, keeping only their IDs when lazy
+    movies_path = os.path.join(directory, "movies.csv")
+    movie_ids, movies_fields, movies_rows, movies_lines, movies_columns = _load_table(
+        movies_path, columns=not lazy
+    )
+
+    # Stream stars into a pair of parallel edge arrays, one row at a time
+    person_index = dict(zip(person_ids, range(len(person_ids))))
+    movie_index = dict(zip(movie_ids, range(len(movie_ids))))
+    edge_people = array("i")
+    edge_movies = array("i")
+    with open(os.path.join(directory, "stars.csv"), encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        person_column = header.index("person_id")
+        movie_column = header.index("movie_id")
+        for row in reader:
+            if not row:
+                continue
+            person = person_index.get(row[person_column])
+            movie = movie_index.get(row[movie_column])
+            if person is not None and movie is not None:
+                edge_people.append(person)
+                edge_movies.append(movie)
+
+    # the ID lookups are only needed while reading the stars
+    del person_index, movie_index
+
+    person_offsets, person_movies = _group(edge_people, edge_movies, len(person_ids))
+    movie_offsets, movie_stars = _group(edge_movies, edge_people, len(movie_ids))
+    graph = CompactGraph(person_ids, movie_ids, person_offsets, person_movies,
+                         movie_offsets, movie_stars)
+
+    if lazy:
+        people = LazyRecords(people_path, people_fields, person_ids, people_rows,
+                             people_lines)
+        movies = LazyRecords(movies_path, movies_fields, movie_ids, movies_rows,
+                             movies_lines)
+    else:
+        people = TableRecords(person_ids, people_fields, people_columns)
+        movies = TableRecords(movie_ids, movies_fields, movies_columns)
+    return graph, names, people, movies
+
+
+def to_arrays(graph, names, people, movies):
+    """
+    Flattens what load_csv returns into (arrays, layout): a dict of named
+    arrays that snapshot.save can store as raw bytes, and a small dict
+    describing how from_arrays puts them back together.
+    """
+    arrays = graph.arrays()
+    _add_table(arrays, "person_ids", graph.person_ids)
+    _add_table(arrays, "movie_ids", graph.movie_ids)
+    _add_table(arrays, "names", names.names)
+    arrays["name_people"] = names.people
+
+    layout = {"lazy": isinstance(people, LazyRecords)}
+    for key, table in (("people", people), ("movies", movies)):
+        layout[key] = {"fields": table.fields}
+        if layout["lazy"]:
+            layout[key]["path"] = table.path
+            arrays[f"{key}.rows"] = table.rows
+            arrays[f"{key}.lines"] = table.lines
+        else:
+            for field, column in zip(table.fields, table.columns):
+                _add_table(arrays, f"{key}.{field}", column)
+    return arrays, layout
+
+
+def from_arrays(arrays, layout):
+    """
+    Rebuilds (graph, names, people, movies) around the arrays saved by
+    to_arrays, without copying them, so memory-mapped arrays stay mapped.
+    """
+    person_ids = _get_table(arrays, "person_ids")
+    movie_ids = _get_table(arrays, "movie_ids")
+    graph = CompactGraph(person_ids, movie_ids,
+                         **{name: arrays[name] for name in ARRAYS})
+    names = NameIndex(_get_table(arrays, "names"), arrays["name_people"], person_ids)
+
+    tables = []
+    for key, ids in (("people", person_ids), ("movies", movie_ids)):
+        fields = layout[key]["fields"]
+        if layout["lazy"]:
+            tables.append(LazyRecords(layout[key]["path"], fields, ids,
+                                      arrays[f"{key}.rows"], arrays[f"{key}.lines"]))
+        else:
+            columns = [_get_table(arrays, f"{key}.{field}") for field in fields]
+            tables.append(TableRecords(ids, fields, columns))
+    return (graph, names, *tables)
+
+
+def _load_table(path, columns=True, names=False):
+    """
+    Reads the CSV file at path, whose first column holds IDs, and returns
+    (ids, fields, rows, lines, columns) with the IDs in sorted order.
+
+    ids is a StringTable of the sorted IDs, fields names the other columns,
+    rows[i] is the row number of ids[i], and row r spans the bytes
+    lines[r]:lines[r + 1] of the file. If columns is True, the last item is
+    a list holding a StringTable for each of the other columns in sorted ID
+    order, and otherwise it is empty. If names is True, the "name" column
+    is also appended to that list as a plain list of strings.
+    """
+    lines = array("q")
+    rows = _scan_rows(path, lines)
+    fields = next(rows)[1:]
+    name_column = fields.index("name") + 1 if names else None
+
+    ids = []
+    values = [[] for _ in fields] if columns else []
+    name_values = []
+    for row in rows:
+        ids.append(row[0])
+        for column, value in zip(values, row[1:]):
+            column.append(value)
+        if names:
+            name_values.append(row[name_column])
+
+    # number records in sorted ID order, so IDs can be found by binary search
+    order = sorted(range(len(ids)), key=ids.__getitem__)
+    tables = [StringTable.build(column[i] for i in order) for column in values]
+    if names:
+        tables.append([name_values[i] for i in order])
+    return (StringTable.build(ids[i] for i in order), fields, array("i", order),
+            lines, tables)
+
+
+def _scan_rows(path, lines):
+    """
+    Yields the header and then every row of the CSV file at path, appending
+    the byte offset of each row to lines, followed by the offset of the end
+    of the file once all rows have been read.
+    """
+    with open(path, "rb") as f:
+        yield next(csv.reader([f.readline().decode("utf-8")]))
+        offset = f.tell()
+        record = b""
+        for line in f:
+            start = offset
+            offset += len(line)
+            if not record:
+                if not line.strip():
+                    continue
+                lines.append(start)
+            record += line
+
+            # an odd number of quotes means a quoted newline inside the row
+            if record.count(b'"') % 2:
+                continue
+            yield next(csv.reader([record.decode("utf-8")]))
+            record = b""
+        lines.append(offset)
+
+
+def _group(keys, values, size):
+    """
+    Groups values by their key with a counting sort, returning an offsets
+    array and the values laid out in CSR order.
+    """
+    offsets = array("i", [0]) * (size + 1)
+    for key in keys:
+        offsets[key + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+
+    grouped = array("i", [0]) * len(values)
+    position = array("i", offsets[:-1])
+    for key, value in zip(keys, values):
+        grouped[position[key]] = value
+        position[key] += 1
+    return offsets, grouped
+
+
+def _add_table(arrays, name, table):
+    arrays[f"{name}.blob"] = table.blob
+    arrays[f"{name}.offsets"] = table.offsets
+
+
+def _get_table(arrays, name):
+    return StringTable(arrays[f"{name}.blob"], arrays[f"{name}.offsets"])
@@ -0,0 +1,108 @@
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+
+# Bump whenever the layout of the snapshot or of the saved records changes
+VERSION = 4
+
+MAGIC = b"DEGSNAP\0"
+HEADER = struct.Struct("<8sII")
+ALIGNMENT = 8
+
+
+def fingerprint(paths):
+    """
+    Returns the size and modification time of each source file,
+    used to tell whether a snapshot is stale.
+    """
+    stamps = {}
+    for path in paths:
+        stat = os.stat(path)
+        stamps[os.path.basename(path)] = [stat.st_size, stat.st_mtime_ns]
+    return stamps
+
+
+def save(path, sources, arrays, records):
+    """
+    Writes a snapshot to path.
+
+    sources is the fingerprint of the files the snapshot was built from,
+    arrays maps names to array.array objects stored as raw bytes, and
+    records is any picklable object stored alongside them.
+    """
+    blob = pickle.dumps(records, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # lay the arrays out one after another, each aligned for direct casting
+    layout = {}
+    offset = 0
+    for name, values in arrays.items():
+        offset = _align(offset)
+        layout[name] = [values.typecode, offset, len(values)]
+        offset += len(values) * values.itemsize
+    records_offset = _align(offset)
+
+    header = json.dumps({
+        "byteorder": sys.byteorder,
+        "sources": sources,
+        "arrays": layout,
+        "records": [records_offset, len(blob)],
+    }).encode("utf-8")
+    base = _align(HEADER.size + len(header))
+
+    # write to a temporary file first so a crash never leaves a torn snapshot
+    partial = f"{path}.partial"
+    with open(partial, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for name, values in arrays.items():
+            f.write(b"\0" * (base + layout[name][1] - f.tell()))
+            values.tofile(f)
+        f.write(b"\0" * (base + records_offset - f.tell()))
+        f.write(blob)
+    os.replace(partial, path)
+
+
+def load(path, sources):
+    """
+    Memory-maps the snapshot at path and returns (arrays, records),
+    with each array exposed as a read-only memoryview into the file.
+
+    Returns None if there is no snapshot, or if it was written by another
+    version or from source files that have since changed.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+
+    with f:
+        prefix = f.read(HEADER.size)
+        if len(prefix) < HEADER.size:
+            return None
+        magic, version, header_length = HEADER.unpack(prefix)
+        if magic != MAGIC or version != VERSION:
+            return None
+        header = json.loads(f.read(header_length).decode("utf-8"))
+        if header["byteorder"] != sys.byteorder or header["sources"] != sources:
+            return None
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(mapped)
+    base = _align(HEADER.size + header_length)
+    arrays = {}
+    for name, (typecode, offset, length) in header["arrays"].items():
+        start = base + offset
+        end = start + length * struct.calcsize(typecode)
+        arrays[name] = view[start:end].cast(typecode)
+
+    records_offset, records_length = header["records"]
+    start = base + records_offset
+    records = pickle.loads(view[start:start + records_length])
+    return arrays, records
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
@@ -0,0 +1,251 @@
+"""
+Bitboard representation of Tic Tac Toe boards.
+
+A board is a pair of integers, one for the cells X holds and one for the
+cells O holds. On a board with cols columns, cell (i, j) is bit cols * i + j.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+X = "X"
+O = "O"
+EMPTY = None
+
+Bitboard = namedtuple("Bitboard", ["x", "o"])
+
+# the four directions a line can run in: across, down and both diagonals
+DIRECTIONS = [(0, 1), (1, 0), (1, 1), (1, -1)]
+
+
+class Geometry():
+    """
+    Precomputed masks for a board with rows x cols cells where k in a row wins.
+    """
+
+    def __init__(self, rows, cols, k):
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        self.cells = rows * cols
+        self.full = (1 << self.cells) - 1
+
+        # every run of k cells in a line, as a mask
+        self.win_masks = []
+        for i in range(rows):
+            for j in range(cols):
+                for di, dj in DIRECTIONS:
+                    end_i, end_j = i + di * (k - 1), j + dj * (k - 1)
+                    if 0 <= end_i < rows and 0 <= end_j < cols:
+                        self.win_masks.append(sum(
+                            1 << self.cell(i + di * step, j + dj * step)
+                            for step in range(k)
+                        ))
+
+        # the runs through each cell, so a win can be checked around the last move
+        self.lines_through = [
+            [mask for mask in self.win_masks if mask >> cell & 1]
+            for cell in range(self.cells)
+        ]
+
+        # the cells touching each cell, including diagonally
+        self.near = [
+            sum(
+                1 << self.cell(i + di, j + dj)
+                for di in (-1, 0, 1) for dj in (-1, 0, 1)
+                if (di or dj) and 0 <= i + di < rows and 0 <= j + dj < cols
+            )
+            for i, j in map(self.position, range(self.cells))
+        ]
+
+        # cells from the center outwards, corners before edges on each ring
+        def centrality(cell):
+            i, j = self.position(cell)
+            di, dj = abs(2 * i - (rows - 1)), abs(2 * j - (cols - 1))
+            return max(di, dj), -(di + dj), cell
+        self.order = sorted(range(self.cells), key=centrality)
+
+    def __repr__(self):
+        return f"Geometry({self.rows}, {self.cols}, {self.k})"
+
+    def cell(self, i, j):
+        """Returns the bit index of cell (i, j)."""
+        return i * self.cols + j
+
+    def position(self, cell):
+        """Returns the (i, j) position of a bit index."""
+        return divmod(cell, self.cols)
+
+    def wins(self, stones, cell):
+        """
+        Returns True if stones holds a full run through cell,
+        which is all that can change when a stone is placed there.
+        """
+        for mask in self.lines_through[cell]:
+            if stones & mask == mask:
+                return True
+        return False
+
+    def has_won(self, stones):
+        """Returns True if stones holds any full run."""
+        for mask in self.win_masks:
+            if stones & mask == mask:
+                return True
+        return False
+
+
+@lru_cache(maxsize=None)
+def geometry(rows=3, cols=3, k=3):
+    """
+    Returns the shared Geometry for a board size and win length.
+    """
+    return Geometry(rows, cols, k)
+
+
+# the classic 3x3 board, three in a row
+STANDARD = geometry(3, 3, 3)
+FULL = STANDARD.full
+WIN_MASKS = STANDARD.win_masks
+
+# whether each 9-bit cell mask contains a full row, column or diagonal
+WINNING = [STANDARD.has_won(mask) for mask in range(FULL + 1)]
+
+
+def from_board(board):
+    """
+    Returns the bitboard for a list of lists board.
+    """
+    x = o = 0
+    cols = len(board[0])
+    for i, row in enumerate(board):
+        for j, cell in enumerate(row):
+            if cell == X:
+                x |= 1 << (cols * i + j)
+            elif cell == O:
+                o |= 1 << (cols * i + j)
+    return Bitboard(x, o)
+
+
+def to_board(bitboard, rows=3, cols=3):
+    """
+    Returns the list of lists board for a bitboard.
+    """
+    def mark(cell):
+        if bitboard.x >> cell & 1:
+            return X
+        if bitboard.o >> cell & 1:
+            return O
+        return EMPTY
+    return [[mark(cols * i + j) for j in range(cols)] for i in range(rows)]
+
+
+def player(bitboard):
+    """
+    Returns player who has the next turn on a bitboard.
+    """
+    return O if bin(bitboard.x).count("1") > bin(bitboard.o).count("1") else X
+
+
+def actions(bitboard):
+    """
+    Returns the empty cells of a 3x3 bitboard as a list of bit indices.
+    """
+    free = FULL & ~(bitboard.x | bitboard.o)
+    return [cell for cell in range(9) if free >> cell & 1]
+
+
+def result(bitboard, cell):
+    """
+    Returns the bitboard that results from the next player taking cell.
+    """
+    bit = 1 << cell
+    if (bitboard.x | bitboard.o) & bit:
+        raise ValueError("Action not valid for board.")
+    if player(bitboard) == X:
+        return Bitboard(bitboard.x | bit, bitboard.o)
+    return Bitboard(bitboard.x, bitboard.o | bit)
+
+
+def winner(bitboard):
+    """
+    Returns the winner of a 3x3 game, if there is one.
+    """
+    if WINNING[bitboard.x]:
+        return X
+    if WINNING[bitboard.o]:
+        return O
+    return None
+
+
+def terminal(bitboard):
+    """
+    Returns True if a 3x3 game is over, False otherwise.
+    """
+    return (bitboard.x | bitboard.o) == FULL or winner(bitboard) is not None
+
+
+def utility(bitboard):
+    """
+    Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+    """
+    win = winner(bitboard)
+    return 1 if win == X else -1 if win == O else 0
+
+
+class Position():
+    """
+    A mutable 3x3 bitboard that moves are played on and taken back in place,
+    keeping track of whose turn it is and how many cells are empty, so a
+    search can walk the game tree without building a board per move.
+    """
+
+    def __init__(self, bits=Bitboard(0, 0)):
+        self.x, self.o = bits
+        self.turn = player(bits)
+        self.empty = STANDARD.cells - bin(self.x | self.o).count("1")
+        self.played = []
+
+    def bits(self):
+        """Returns the position as an immutable Bitboard."""
+        return Bitboard(self.x, self.o)
+
+    def push(self, cell):
+        """
+        Plays cell for the player to move. The cell must be empty,
+        which is not checked.
+        """
+        if self.turn == X:
+            self.x |= 1 << cell
+            self.turn = O
+        else:
+            self.o |= 1 << cell
+            self.turn = X
+        self.empty -= 1
+        self.played.append(cell)
+
+    def pop(self):
+        """Takes back the last move played and returns its cell."""
+        cell = self.played.pop()
+        if self.turn == O:
+            self.x &= ~(1 << cell)
+            self.turn = X
+        else:
+            self.o &= ~(1 << cell)
+            self.turn = O
+        self.empty += 1
+        return cell
+
+
+def permutation_table(symmetry):
+    """
+    Returns a list mapping every 9-bit cell mask to the mask it becomes
+    under symmetry, given as the cell that lands on each cell.
+    """
+    table = []
+    for mask in range(FULL + 1):
+        permuted = 0
+        for cell, source in enumerate(symmetry):
+            if mask >> source & 1:
+                permuted |= 1 << cell
+        table.append(permuted)
+    return table
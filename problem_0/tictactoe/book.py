@@ -0,0 +1,55 @@
+"""
+Generates the perfect-play opening book for 3x3 Tic Tac Toe.
+
+Usage: python book.py [output file]
+"""
+
+import sys
+
+import tictactoe as ttt
+
+
+def generate():
+    """
+    Solves every board reachable from the initial state and returns the
+    book: one byte per base-3 board encoding holding the best move's cell
+    index, or ttt.NO_MOVE for finished and unreachable boards.
+    """
+    # search from scratch rather than from an older book
+    ttt.book = None
+
+    book = bytearray([ttt.NO_MOVE]) * 3 ** 9
+    seen = set()
+    frontier = [ttt.initial_state()]
+    while frontier:
+        board = frontier.pop()
+        code = ttt.encode(board)
+        if code in seen:
+            continue
+        seen.add(code)
+
+        # the game is over, so there is nothing to play
+        if ttt.winner(board) is not None or not ttt.actions(board):
+            continue
+
+        i, j = ttt.minimax(board)
+        book[code] = 3 * i + j
+        for action in ttt.actions(board):
+            frontier.append(ttt.result(board, action))
+    return bytes(book)
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python book.py [output file]")
+    path = sys.argv[1] if len(sys.argv) == 2 else ttt.BOOK_FILE
+
+    book = generate()
+    with open(path, "wb") as f:
+        f.write(book)
+    solved = sum(move != ttt.NO_MOVE for move in book)
+    print(f"Wrote {solved} positions to {path}.")
+
+
+if __name__ == "__main__":
+    main()
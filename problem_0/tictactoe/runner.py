@@ -1,5 +1,6 @@
 import pygame
 import sys
+import threading
 import time
 
 import tictactoe as ttt
@@ -17,9 +18,24 @@ mediumFont = pygame.font.Font("OpenSans-Regular.ttf", 28)
 largeFont = pygame.font.Font("OpenSans-Regular.ttf", 40)
 moveFont = pygame.font.Font("OpenSans-Regular.ttf", 60)
 
+# Seconds the computer takes at least for each move, so it does not play instantly
+AI_DELAY = 0.5
+
+clock = pygame.time.Clock()
+
 user = None
 board = ttt.initial_state()
-ai_turn = False
+
+# AI move being worked out in the background, or None. Resetting the game
+# cancels it, so its search stops and its move is never played.
+ai_job = None
+
+
+def think(job):
+    """Works out the AI move for job's board and stores it in the job."""
+    job["move"] = ttt.minimax(job["board"], cancel=job["cancel"])
+    job["done"] = True
+
 
 while True:
 
@@ -102,21 +118,21 @@ while True:
         elif user == player:
             title = f"Play as {user}"
         else:
-            title = f"Computer thinking..."
+            title = "Computer thinking" + "." * (int(time.time() * 2) % 4)
         title = largeFont.render(title, True, white)
         titleRect = title.get_rect()
         titleRect.center = ((width / 2), 30)
         screen.blit(title, titleRect)
 
-        # Check for AI move
+        # Check for AI move, starting it in the background and polling until it is done
         if user != player and not game_over:
-            if ai_turn:
-                time.sleep(0.5)
-                move = ttt.minimax(board)
-                board = ttt.result(board, move)
-                ai_turn = False
-            else:
-                ai_turn = True
+            if ai_job is None:
+                ai_job = {"board": board, "started": time.time(), "move": None, "done": False,
+                          "cancel": threading.Event()}
+                threading.Thread(target=think, args=(ai_job,), daemon=True).start()
+            elif ai_job["done"] and time.time() - ai_job["started"] >= AI_DELAY:
+                board = ttt.result(board, ai_job["move"])
+                ai_job = None
 
         # Check for a user move
         click, _, _ = pygame.mouse.get_pressed()
@@ -141,6 +157,9 @@ while True:
                     time.sleep(0.2)
                     user = None
                     board = ttt.initial_state()
-                    ai_turn = False
+                    if ai_job is not None:
+                        ai_job["cancel"].set()
+                    ai_job = None
 
     pygame.display.flip()
+    clock.tick(60)
@@ -0,0 +1,287 @@
+"""
+Depth-limited alpha-beta search for m,n,k games on bitboards.
+"""
+
+import math
+import multiprocessing
+import time
+
+import bitboard
+
+# score of a won position, far above anything the heuristic can return
+WIN = 10 ** 12
+
+# heuristic weight of a run holding n stones of only one player,
+# with every run of 7 or more stones weighted the same
+RUN_WEIGHTS = [0, 1, 10, 100, 1000, 10000, 100000, 1000000]
+
+# kinds of values kept in the transposition tables, here and in tictactoe.py
+EXACT = "exact"
+LOWER = "lower"
+UPPER = "upper"
+
+# transposition tables per geometry, kept across searches; each maps
+# (stones to move, other stones, depth) to (kind, value, move)
+tables = {}
+
+# entries a table may hold before it is cleared
+TABLE_LIMIT = 1_000_000
+
+
+# lowest value a shared bound can hold, standing in for negative infinity
+NO_BOUND = -(2 ** 62)
+
+# best root value found so far at the current depth, shared by pool workers
+shared_bound = None
+
+
+class TimeUp(Exception):
+    """Raised inside a search when its deadline passes or it is cancelled."""
+    pass
+
+
+class Search():
+    """
+    Negamax alpha-beta search for one position on a Geometry.
+
+    Values are from the point of view of the player to move. A win found
+    with depth d still to search scores WIN + d, so quicker wins score
+    higher and a value only depends on the position and the depth searched.
+
+    Setting cancel, a threading.Event, stops the search like a deadline.
+    """
+
+    def __init__(self, geometry, deadline=None, cancel=None):
+        self.geometry = geometry
+        self.deadline = deadline
+        self.cancel = cancel
+        self.nodes = 0
+        self.table = tables.setdefault(geometry, {})
+        if len(self.table) > TABLE_LIMIT:
+            self.table.clear()
+
+    def best_move(self, mine, theirs, time_limit=None, max_depth=None):
+        """
+        Returns (value, cell) for the player holding mine, deepening the
+        search one ply at a time until max_depth, the end of the game, or
+        time_limit seconds, and answering from the deepest finished search.
+        """
+        if time_limit is not None:
+            self.deadline = time.monotonic() + time_limit
+        empty = self.geometry.cells - bin(mine | theirs).count("1")
+        limit = empty if max_depth is None else min(max_depth, empty)
+
+        moves = self.moves(mine, theirs)
+        best = (0, moves[0] if moves else None)
+        for depth in range(1, limit + 1):
+            try:
+                best = self.root(mine, theirs, depth)
+            except TimeUp:
+                break
+
+            # a forced win or loss will not change with deeper search
+            if abs(best[0]) >= WIN:
+                break
+        return best
+
+    def root(self, mine, theirs, depth):
+        """
+        Returns (value, cell) for the best move searched to depth,
+        preferring the earliest move in order among equal values.
+        """
+        alpha = -math.inf
+        move = None
+        for cell in self.moves(mine, theirs):
+            value = self.child_value(mine, theirs, cell, depth, alpha, math.inf)
+            if move is None or value > alpha:
+                alpha = value
+                move = cell
+        return alpha, move
+
+    def child_value(self, mine, theirs, cell, depth, alpha, beta):
+        """
+        Returns the value of playing cell, for the player holding mine.
+        """
+        placed = mine | 1 << cell
+        if self.geometry.wins(placed, cell):
+            return WIN + depth
+        return -self.negamax(theirs, placed, depth - 1, -beta, -alpha)
+
+    def negamax(self, mine, theirs, depth, alpha, beta):
+        """
+        Returns the value of the position for the player holding mine,
+        exact when it lies inside (alpha, beta) and a bound otherwise.
+        """
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                raise TimeUp
+            if self.cancel is not None and self.cancel.is_set():
+                raise TimeUp
+
+        # the player who just moved did not win, so a full board is a draw
+        if mine | theirs == self.geometry.full:
+            return 0
+        if depth == 0:
+            return self.evaluate(mine, theirs)
+
+        # reuse an earlier search of this position to the same depth
+        key = (mine, theirs, depth)
+        entry = self.table.get(key)
+        hint = None
+        if entry is not None:
+            kind, value, hint = entry
+            if kind == EXACT or (kind == LOWER and value >= beta) or (kind == UPPER and value <= alpha):
+                return value
+        else:
+            # the best move found one iteration shallower is the best first try
+            shallower = self.table.get((mine, theirs, depth - 1))
+            if shallower is not None:
+                hint = shallower[2]
+        window = (alpha, beta)
+
+        best = -math.inf
+        move = None
+        for cell in self.moves(mine, theirs, hint):
+            value = self.child_value(mine, theirs, cell, depth, alpha, beta)
+            if value > best:
+                best = value
+                move = cell
+                if best > alpha:
+                    alpha = best
+                    if alpha >= beta:
+                        break
+
+        if best <= window[0]:
+            kind = UPPER
+        elif best >= window[1]:
+            kind = LOWER
+        else:
+            kind = EXACT
+        self.table[key] = (kind, best, move)
+        return best
+
+    def moves(self, mine, theirs, hint=None):
+        """
+        Returns the cells worth trying, hint first and then from the center
+        outwards. On boards larger than 4x4 only cells next to a stone
+        are tried, once there is a stone on the board.
+        """
+        geometry = self.geometry
+        taken = mine | theirs
+        candidates = geometry.full & ~taken
+        if geometry.cells > 16 and taken:
+            near = 0
+            stones = taken
+            while stones:
+                low = stones & -stones
+                near |= geometry.near[low.bit_length() - 1]
+                stones ^= low
+            candidates &= near
+
+        moves = [cell for cell in geometry.order if candidates >> cell & 1]
+        if hint is not None and hint in moves:
+            moves.remove(hint)
+            moves.insert(0, hint)
+        return moves
+
+    def evaluate(self, mine, theirs):
+        """
+        Scores an unfinished position for the player holding mine by the
+        runs each player could still complete and how full they are.
+        """
+        score = 0
+        for mask in self.geometry.win_masks:
+            own = mine & mask
+            other = theirs & mask
+            if own and not other:
+                score += RUN_WEIGHTS[min(bin(own).count("1"), 7)]
+            elif other and not own:
+                score -= RUN_WEIGHTS[min(bin(other).count("1"), 7)]
+        return score
+
+
+def parallel_best_move(geometry, mine, theirs, time_limit=None, max_depth=None,
+                       workers=None, stats=None, cancel=None):
+    """
+    Returns (value, cell) like Search.best_move, but searches the root moves
+    of each depth in a pool of worker processes.
+
+    The first move is searched on its own to set a bound, then the rest are
+    shared out. Workers share the best value found so far at the current
+    depth and start each root move with it as their bound, so moves that
+    cannot beat it are cut off early. Moves that could tie it are still
+    searched exactly, so the move picked for a depth is the same one the
+    serial search picks. The positions the workers search are added to
+    stats["nodes"] when stats is given.
+
+    Setting cancel, a threading.Event, stops the search before the next
+    batch of root moves is handed out; moves already handed out finish.
+    """
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+    empty = geometry.cells - bin(mine | theirs).count("1")
+    limit = empty if max_depth is None else min(max_depth, empty)
+    moves = Search(geometry).moves(mine, theirs)
+    best = (0, moves[0] if moves else None)
+    if not moves:
+        return best
+
+    bound = multiprocessing.Value("q", NO_BOUND)
+    size = (geometry.rows, geometry.cols, geometry.k)
+    with multiprocessing.Pool(workers, initializer=_share_bound, initargs=(bound,)) as pool:
+        for depth in range(1, limit + 1):
+            if cancel is not None and cancel.is_set():
+                break
+            bound.value = NO_BOUND
+            tasks = [(size, mine, theirs, cell, depth, deadline) for cell in moves]
+            results = [pool.apply(_search_root_move, (tasks[0],))]
+            if cancel is not None and cancel.is_set():
+                break
+            if results[0][0] is not None:
+                results += pool.map(_search_root_move, tasks[1:], chunksize=1)
+            values = [value for value, nodes in results]
+            if stats is not None:
+                stats["nodes"] += sum(nodes for value, nodes in results)
+
+            # a worker ran out of time, so this depth is unfinished
+            if None in values:
+                break
+
+            # the first move with the highest value, as in Search.root
+            value = max(values)
+            best = (value, moves[values.index(value)])
+
+            # a forced win or loss will not change with deeper search
+            if abs(value) >= WIN:
+                break
+    return best
+
+
+def _share_bound(bound):
+    global shared_bound
+    shared_bound = bound
+
+
+def _search_root_move(task):
+    """
+    Returns (value, nodes) for one root move, where value is exact if it
+    could reach the shared bound and an upper bound below it otherwise, or
+    None if time ran out, and nodes is the number of positions searched.
+    """
+    size, mine, theirs, cell, depth, deadline = task
+    if deadline is not None and time.monotonic() > deadline:
+        return None, 0
+    search = Search(bitboard.geometry(*size), deadline)
+
+    # searching just below the bound keeps moves that tie it exact
+    alpha = shared_bound.value
+    alpha = -math.inf if alpha == NO_BOUND else alpha - 1
+    try:
+        value = search.child_value(mine, theirs, cell, depth, alpha, math.inf)
+    except TimeUp:
+        return None, search.nodes
+
+    with shared_bound.get_lock():
+        if value > shared_bound.value:
+            shared_bound.value = value
+    return value, search.nodes
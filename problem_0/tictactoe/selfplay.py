@@ -0,0 +1,205 @@
+"""
+Headless tournament and throughput harness for tictactoe.py.
+
+Play the AI against itself, starting each game from a few random moves:
+    python selfplay.py --games 50 --openings 2
+
+Play the AI against a random mover on a larger board:
+    python selfplay.py --opponent random --rows 5 --cols 5 --k 4 --time-limit 0.2
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+
+import search
+import tictactoe as ttt
+
+# kinds of player a side can be
+AI = "ai"
+RANDOM = "random"
+
+
+def play_game(players, rng, rows=3, cols=3, k=None, openings=0, time_limit=None,
+              max_depth=None, workers=None, cold=False):
+    """
+    Plays one game between players, a dict mapping X and O to AI or RANDOM,
+    after openings random moves, and returns a record of the winner and of
+    every move with who played it, the positions searched and the time taken.
+
+    With cold set, the transposition tables are cleared before every AI move
+    so each search starts from scratch.
+    """
+    board = ttt.initial_state(rows, cols)
+    moves = []
+    while not ttt.terminal(board, k):
+        player = ttt.player(board)
+        kind = RANDOM if len(moves) < openings else players[player]
+
+        if kind == RANDOM:
+            action = rng.choice(sorted(ttt.actions(board)))
+            moves.append({"player": player, "kind": kind, "action": list(action)})
+        else:
+            if cold:
+                ttt.transpositions.clear()
+                search.tables.clear()
+            started = time.perf_counter()
+            action = ttt.minimax(board, k, time_limit, max_depth, workers)
+            seconds = time.perf_counter() - started
+            moves.append({
+                "player": player,
+                "kind": kind,
+                "action": list(action),
+                "source": ttt.stats["source"],
+                "nodes": ttt.stats["nodes"],
+                "seconds": seconds,
+            })
+        board = ttt.result(board, action)
+
+    return {"winner": ttt.winner(board, k), "moves": moves}
+
+
+def run(games=10, opponent=AI, rows=3, cols=3, k=None, openings=0, time_limit=None,
+        max_depth=None, workers=None, cold=False, seed=0):
+    """
+    Plays games games and returns a report holding every game and a summary
+    of the outcomes, the positions searched and the AI's move latency.
+
+    Against a random opponent the AI alternates between playing X and O.
+    """
+    rng = random.Random(seed)
+    results = []
+    for game in range(games):
+        if opponent == AI:
+            players = {ttt.X: AI, ttt.O: AI}
+        elif game % 2 == 0:
+            players = {ttt.X: AI, ttt.O: RANDOM}
+        else:
+            players = {ttt.X: RANDOM, ttt.O: AI}
+        record = play_game(players, rng, rows, cols, k, openings, time_limit, max_depth,
+                           workers, cold)
+        record["players"] = players
+        results.append(record)
+
+    return {
+        "opponent": opponent,
+        "board": [rows, cols, ttt.win_length(ttt.initial_state(rows, cols), k)],
+        "openings": openings,
+        "time_limit": time_limit,
+        "max_depth": max_depth,
+        "workers": workers,
+        "cold": cold,
+        "seed": seed,
+        "games": results,
+        "summary": summarize(results),
+    }
+
+
+def summarize(results):
+    """
+    Returns the outcome counts, node totals and latency percentiles
+    for a list of game records.
+    """
+    outcomes = {ttt.X: 0, ttt.O: 0, "tie": 0}
+    ai_outcomes = {"win": 0, "loss": 0, "tie": 0}
+    for record in results:
+        winner = record["winner"]
+        outcomes[winner or "tie"] += 1
+
+        # only games with a single AI side say how well the AI did
+        ai_sides = [player for player, kind in record["players"].items() if kind == AI]
+        if len(ai_sides) == 1:
+            if winner is None:
+                ai_outcomes["tie"] += 1
+            elif winner == ai_sides[0]:
+                ai_outcomes["win"] += 1
+            else:
+                ai_outcomes["loss"] += 1
+
+    ai_moves = [move for record in results for move in record["moves"] if move["kind"] == AI]
+    times = [move["seconds"] for move in ai_moves]
+    nodes = [move["nodes"] for move in ai_moves]
+    sources = {}
+    for move in ai_moves:
+        sources[move["source"]] = sources.get(move["source"], 0) + 1
+
+    return {
+        "games": len(results),
+        "outcomes": outcomes,
+        "ai_outcomes": ai_outcomes,
+        "ai_moves": len(ai_moves),
+        "sources": sources,
+        "total_nodes": sum(nodes),
+        "mean_nodes": statistics.mean(nodes) if nodes else None,
+        "max_nodes": max(nodes, default=None),
+        "nodes_per_second": sum(nodes) / sum(times) if sum(times) else None,
+        "latency_seconds": percentiles(times),
+    }
+
+
+def percentiles(values):
+    """
+    Returns the median, 90th and 99th percentile and maximum of values,
+    or None if there are none.
+    """
+    if not values:
+        return None
+    if len(values) == 1:
+        return {"p50": values[0], "p90": values[0], "p99": values[0], "max": values[0]}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {
+        "p50": statistics.median(values),
+        "p90": cuts[89],
+        "p99": cuts[98],
+        "max": max(values),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play tictactoe games without a window.")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--opponent", choices=[AI, RANDOM], default=AI)
+    parser.add_argument("--rows", type=int, default=3)
+    parser.add_argument("--cols", type=int, default=3)
+    parser.add_argument("--k", type=int, help="how many in a row win")
+    parser.add_argument("--openings", type=int, default=0,
+                        help="random moves to start each game with")
+    parser.add_argument("--time-limit", type=float)
+    parser.add_argument("--max-depth", type=int)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--cold", action="store_true",
+                        help="clear the transposition tables before every AI move")
+    parser.add_argument("--no-book", action="store_true",
+                        help="solve 3x3 boards instead of using the opening book")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", metavar="FILE",
+                        help="write the JSON report to FILE instead of stdout")
+
+    args = parser.parse_args()
+
+    if args.no_book:
+        ttt.book = None
+
+    report = run(args.games, args.opponent, args.rows, args.cols, args.k, args.openings,
+                 args.time_limit, args.max_depth, args.workers, args.cold, args.seed)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    summary = report["summary"]
+    latency = summary["latency_seconds"] or {"p50": 0, "p99": 0}
+    print(f"{summary['games']} games, outcomes {summary['outcomes']}, "
+          f"AI {summary['ai_outcomes']}, {summary['ai_moves']} AI moves, "
+          f"{summary['total_nodes']} nodes, "
+          f"p50 {latency['p50']:.6f}s, p99 {latency['p99']:.6f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,21 +3,36 @@
 Tic Tac Toe Player
 """
 
+import json
 import math
-from copy import deepcopy
+import os
+
+import bitboard
+import search
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# seconds to search a move on boards other than 3x3 when no limit is given
+DEFAULT_TIME_LIMIT = 1.0
+
+# perfect-play opening book for 3x3 boards, written by book.py
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+
+# book entry for boards with no move to play
+NO_MOVE = 255
+
+# what the last call to minimax did: the positions it searched, and
+# whether its move came from the "book", a "solve" or a depth-limited "search"
+stats = {"nodes": 0, "source": None}
+
 
-def initial_state():
+def initial_state(rows=3, cols=3):
     """
     Returns starting state of the board.
     """
-    return [[EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY]]
+    return [[EMPTY] * cols for _ in range(rows)]
 
 
 def player(board):
@@ -52,7 +67,7 @@ def actions(board):
 
     # loop through board to add empty spaces to set
     for i in range(len(board)):
-        for j in range(3):
+        for j in range(len(board[i])):
             if board[i][j] == EMPTY:
                 empty_space = (i, j)
                 possible_moves.add(empty_space)
@@ -67,87 +82,78 @@ def result(board, action):
     # check to see whose turn it is, assign it to value
     move = player(board)
     
-    # make a deep copy of the board
-    board_copy = deepcopy(board)
+    # copy the rows; the cells are strings or None, so they can be shared
+    board_copy = [list(row) for row in board]
 
-    # check to see if action on board is actually valid. If no, raise error. If yes, mark spot on deep copy.
+    # check to see if action on board is actually valid. If no, raise error. If yes, mark spot on the copy.
     if board[action[0]][action[1]] != EMPTY:
-        raise InputError("Action not valid for board.")
+        raise ValueError("Action not valid for board.")
     else:
         board_copy[action[0]][action[1]] = move
     
     return board_copy
 
 
+def win_length(board, k=None):
+    """
+    Returns how many in a row win on the board: k if given,
+    otherwise the length of the board's shorter side.
+    """
+    if k is not None:
+        return k
+    return min(len(board), len(board[0]))
 
-def winner(board):
+
+def winner(board, k=None):
     """
     Returns the winner of the game, if there is one.
+    k in a row wins, the full width of a square board by default.
     """
-    # check for horizontal wins
-    for i in board:
-        if i[0] == i[1] and i[1] == i[2]:
-            if i[0] != EMPTY:
-                return i[0]
-
-    # check for vertical wins
-    for x in range(3):
-        if board[0][x] == board[1][x] and board[1][x] == board[2][x]:
-            if board[0][x] != EMPTY:
-                return board[0][x]
-
-    # check for diagonal wins
-    if board[0][0] == board[1][1] and board[1][1] == board[2][2]:
-        if board[0][0] != EMPTY:
-            return board[0][0]
-    elif board[0][2] == board[1][1] and board[1][1] == board[2][0]:
-        if board[0][2] != EMPTY:
-            return board[0][2]
+    k = win_length(board, k)
+    rows = len(board)
+    cols = len(board[0])
+
+    # look for k in a row starting from every occupied cell
+    for i in range(rows):
+        for j in range(cols):
+            mark = board[i][j]
+            if mark == EMPTY:
+                continue
+
+            # across, down and both diagonals
+            for di, dj in bitboard.DIRECTIONS:
+                end_i, end_j = i + di * (k - 1), j + dj * (k - 1)
+                if not (0 <= end_i < rows and 0 <= end_j < cols):
+                    continue
+                if all(board[i + di * step][j + dj * step] == mark for step in range(k)):
+                    return mark
 
     # no winners, return none
-    else:
-        return None
-    
+    return None
 
 
-def terminal(board):
+def terminal(board, k=None):
     """
     Returns True if game is over, False otherwise.
     """
     # check first to see if there is a winner
-    win = winner(board)
+    win = winner(board, k)
 
     # if there is a winner
     if win != None:
         return True
 
-    # if no winner, check to see if all spots are filled
-    else:
-
-        # create counter to count empty spots
-        empty_counter = 0
-
-        # loop through spots
-        for i in range(len(board)):
-            for j in range(3):
-                if board[i][j] == EMPTY:
-                    empty_counter += 1
-
-        # if empty counter greater than 0 game is over
-        if empty_counter > 0:
-            return False
-        else:
-            return True
-
+    # if no winner, the game is over only once all spots are filled
+    return all(cell != EMPTY for row in board for cell in row)
 
 
-def utility(board):
+def utility(board, k=None):
     """
     Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
     """
 
     # declare the winner
-    the_winner = winner(board)
+    the_winner = winner(board, k)
 
     # set conditions
     if the_winner == None:
@@ -157,42 +163,234 @@ def utility(board):
     else:
         return -1
 
-def minimax(board):
+def minimax(board, k=None, time_limit=None, max_depth=None, workers=None, cancel=None):
     """
     Returns the optimal action for the current player on the board.
+
+    The classic 3x3 game is always solved exactly. Any other board size or
+    win length k is searched with iterative deepening alpha-beta and a
+    heuristic evaluation, for at most max_depth moves ahead and for about
+    time_limit seconds (one second if neither limit is given). With more
+    than one worker, the moves from the root are searched in parallel
+    processes.
+
+    Setting cancel, a threading.Event, from another thread stops the search
+    early, and then None is returned instead of a move.
     """
 
+    stats["nodes"] = 0
+    stats["source"] = None
+
     # if the game is over then it is no ones turn
-    if terminal(board):
+    if terminal(board, k):
         return None
-    
-    # else if player X turn
-    elif player(board) == X:
-        value, move = max_value(board)
-        return move
 
-    # else if player Y turn
+    # search on the compact bitboard form of the board
+    bits = bitboard.from_board(board)
+    rows, cols, k = len(board), len(board[0]), win_length(board, k)
+
+    # any other game is searched to a depth or time limit
+    if (rows, cols, k) != (3, 3, 3) or time_limit is not None or max_depth is not None:
+        geometry = bitboard.geometry(rows, cols, k)
+        if time_limit is None and max_depth is None:
+            time_limit = DEFAULT_TIME_LIMIT
+        mine, theirs = (bits.x, bits.o) if player(board) == X else (bits.o, bits.x)
+        stats["source"] = "search"
+        if workers is not None and workers > 1:
+            value, move = search.parallel_best_move(geometry, mine, theirs, time_limit,
+                                                    max_depth, workers, stats, cancel)
+        else:
+            searcher = search.Search(geometry, cancel=cancel)
+            value, move = searcher.best_move(mine, theirs, time_limit, max_depth)
+            stats["nodes"] = searcher.nodes
+        if cancel is not None and cancel.is_set():
+            return None
+        return geometry.position(move)
+
+    # answer straight from the opening book when there is one
+    if book is not None:
+        move = book[encode(board)]
+        if move != NO_MOVE:
+            stats["source"] = "book"
+            return divmod(move, 3)
+    stats["source"] = "solve"
+
+    # play the search out on one position, making and taking back moves in place
+    position = bitboard.Position(bits)
+
+    try:
+        # else if player X turn
+        if position.turn == X:
+            value, move = max_value(position, cancel=cancel)
+
+        # else if player Y turn
+        else:
+            value, move = min_value(position, cancel=cancel)
+    except search.TimeUp:
+        return None
+
+    # turn the winning cell back into a (row, column) action
+    return divmod(move, 3)
+
+
+def encode(board):
+    """
+    Returns the base-3 number for a 3x3 board, reading the cells row by row
+    with 0 for empty, 1 for X and 2 for O.
+    """
+    code = 0
+    for row in board:
+        for cell in row:
+            code = 3 * code + (1 if cell == X else 2 if cell == O else 0)
+    return code
+
+
+def load_book(path):
+    """
+    Returns the opening book stored at path, or None if there is none.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    return data if len(data) == 3 ** 9 else None
+
+
+# order in which cells are tried: center first, then corners, then edges
+MOVE_ORDER = [4, 0, 2, 6, 8, 1, 3, 5, 7]
+
+# the 8 rotations and reflections of the board, each given as the cell
+# (as an index 0-8) that lands on each cell of the transformed board
+SYMMETRIES = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8],  # identity
+    [6, 3, 0, 7, 4, 1, 8, 5, 2],  # rotate 90 degrees
+    [8, 7, 6, 5, 4, 3, 2, 1, 0],  # rotate 180 degrees
+    [2, 5, 8, 1, 4, 7, 0, 3, 6],  # rotate 270 degrees
+    [2, 1, 0, 5, 4, 3, 8, 7, 6],  # mirror left to right
+    [6, 7, 8, 3, 4, 5, 0, 1, 2],  # mirror top to bottom
+    [0, 3, 6, 1, 4, 7, 2, 5, 8],  # mirror along the main diagonal
+    [8, 5, 2, 7, 4, 1, 6, 3, 0],  # mirror along the other diagonal
+]
+
+# what each symmetry does to every 9-bit cell mask
+PERMUTATIONS = [bitboard.permutation_table(symmetry) for symmetry in SYMMETRIES]
+
+# maps canonical board keys to (kind, value, move) from earlier searches,
+# with the move given as a cell index on the canonical board
+transpositions = {}
+
+
+def canonical(bits):
+    """
+    Returns (key, symmetry) for a Bitboard or Position, where key is the
+    smallest integer encoding of all its rotations and reflections and
+    symmetry is the transformation that produces it.
+    """
+    key, index = min(
+        ((permutation[bits.x] << 9) | permutation[bits.o], index)
+        for index, permutation in enumerate(PERMUTATIONS)
+    )
+    return key, SYMMETRIES[index]
+
+
+def lookup(bits, alpha, beta):
+    """
+    Returns (key, symmetry, known), where known is a (value, move) result for
+    the bitboard from the transposition table, or None if the table does not
+    settle its value within the (alpha, beta) window.
+    """
+    key, symmetry = canonical(bits)
+    entry = transpositions.get(key)
+    if entry is None:
+        return key, symmetry, None
+    kind, value, move = entry
+    if move is not None:
+        move = symmetry[move]
+    if (kind == search.EXACT or (kind == search.LOWER and value >= beta)
+            or (kind == search.UPPER and value <= alpha)):
+        return key, symmetry, (value, move)
+    return key, symmetry, None
+
+
+def store(key, symmetry, value, move, alpha, beta):
+    """
+    Records the result of searching a board in the (alpha, beta) window
+    under its canonical key.
+    """
+    if value <= alpha:
+        kind = search.UPPER
+    elif value >= beta:
+        kind = search.LOWER
     else:
-        value, move = min_value(board)
-        return move
+        kind = search.EXACT
+    if move is not None:
+        move = symmetry.index(move)
+    transpositions[key] = (kind, value, move)
+
+
+def save_table(path):
+    """
+    Writes the transposition table to a JSON file.
+    """
+    with open(path, "w") as f:
+        json.dump(transpositions, f)
 
 
-def max_value(board):
-    # if end of game return none
-    if terminal(board):
-        return utility(board), None
+def load_table(path):
+    """
+    Adds the positions in a JSON file written by save_table to the
+    transposition table.
+    """
+    with open(path) as f:
+        transpositions.update(
+            (int(key), tuple(entry)) for key, entry in json.load(f).items()
+        )
+
+
+def max_value(position, alpha=-math.inf, beta=math.inf, cancel=None):
+    """
+    Returns (value, move) for the X player to move on a bitboard Position,
+    with the move as a cell index, searching with alpha-beta pruning.
+    alpha is the value X is already assured of and beta the value O is,
+    so any line outside (alpha, beta) will never be played.
+
+    Raises search.TimeUp once cancel, a threading.Event, is set. Only
+    finished boards are stored, so the transposition table stays sound.
+    """
+    if cancel is not None and cancel.is_set():
+        raise search.TimeUp
+    x, o = position.x, position.o
+    stats["nodes"] += 1
+
+    # O just moved, so only O can have won
+    if bitboard.WINNING[o]:
+        return -1, None
+    if position.empty == 0:
+        return 0, None
+
+    # reuse an earlier search of this board or any rotation or reflection of it
+    key, symmetry, known = lookup(position, alpha, beta)
+    if known is not None:
+        return known
+    window = (alpha, beta)
 
     # set variable to negative infinity, as all values will be higher
-    v = float('-inf')
+    v = -math.inf
 
     # set a variable to track the ideal move
     move = None
 
-    # loop through actions
-    for action in actions(board):
+    # loop through empty cells
+    taken = x | o
+    for cell in MOVE_ORDER:
+        if taken >> cell & 1:
+            continue
 
-        # run the program to see what the min player would do. Record utility value and action/move.
-        temp, min_act = min_value(result(board, action))
+        # run the program to see what the min player would do. Record utility value.
+        position.push(cell)
+        temp, _ = min_value(position, alpha, beta, cancel)
+        position.pop()
 
         # if value is greater than v
         if temp > v:
@@ -200,34 +398,59 @@ def max_value(board):
             # set v to temp value
             v = temp
 
-            # set move to the current action
-            move = action
+            # set move to the current cell
+            move = cell
 
-            # identify and return the move that garantees a win
-            if v == 1:
-                return v, move
+            # O will never allow this line, so stop looking (also covers a garanteed win)
+            if v >= beta or v == 1:
+                break
 
-    # return the next best
-    return v, move
+            # raise the value X is assured of
+            alpha = max(alpha, v)
 
+    # remember the result, then return the best move found
+    store(key, symmetry, v, move, *window)
+    return v, move
 
-def min_value(board):
 
-    # if game over return none
-    if terminal(board):
-        return utility(board), None
+def min_value(position, alpha=-math.inf, beta=math.inf, cancel=None):
+    """
+    Returns (value, move) for the O player to move on a bitboard Position,
+    with the move as a cell index, searching with alpha-beta pruning.
+    """
+    if cancel is not None and cancel.is_set():
+        raise search.TimeUp
+    x, o = position.x, position.o
+    stats["nodes"] += 1
+
+    # X just moved, so only X can have won
+    if bitboard.WINNING[x]:
+        return 1, None
+    if position.empty == 0:
+        return 0, None
+
+    # reuse an earlier search of this board or any rotation or reflection of it
+    key, symmetry, known = lookup(position, alpha, beta)
+    if known is not None:
+        return known
+    window = (alpha, beta)
 
     # set variable to infinity since everything will be lower
-    v = float('inf')
+    v = math.inf
 
     # set variable to track the ideal move
     move = None
 
-    # loop through actions
-    for action in actions(board):
+    # loop through empty cells
+    taken = x | o
+    for cell in MOVE_ORDER:
+        if taken >> cell & 1:
+            continue
 
-        # run the equation to see what the max player would do. Record the value and action/move
-        temp, max_act = max_value(result(board, action))
+        # run the equation to see what the max player would do. Record the value.
+        position.push(cell)
+        temp, _ = max_value(position, alpha, beta, cancel)
+        position.pop()
 
         # if this is a better option
         if temp < v:
@@ -235,12 +458,20 @@ def min_value(board):
             # assign v to better option
             v = temp
 
-            # set move to the best action
-            move = action
+            # set move to the best cell
+            move = cell
+
+            # X will never allow this line, so stop looking (also covers a garanteed win)
+            if v <= alpha or v == -1:
+                break
 
-            # if the move garantees a win, return move
-            if v == -1:
-                return v, move
+            # lower the value O is assured of
+            beta = min(beta, v)
 
-    # return best option
+    # remember the result, then return the best option
+    store(key, symmetry, v, move, *window)
     return v, move
+
+
+# the opening book is read once, when the module is first imported
+book = load_book(BOOK_FILE)
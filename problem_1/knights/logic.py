@@ -1,8 +1,22 @@
 import itertools
+import weakref
+
+import sat
+
+# most symbols model_check evaluates whole truth tables for; larger
+# problems are handed to the SAT solver
+TABLE_LIMIT = 24
+
+# truth tables are built 2^TABLE_CHUNK models at a time, so no column
+# takes more than 2^TABLE_CHUNK bits of memory
+TABLE_CHUNK = 16
 
 
 class Sentence():
 
+    # interned sentences fill in the caches, other sentences leave them unset
+    __slots__ = ("cached_hash", "cached_symbols", "__weakref__")
+
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
@@ -15,6 +29,70 @@ class Sentence():
         """Returns a set of all symbols in the logical sentence."""
         return set()
 
+    def expression(self, indices, lines, names):
+        """
+        Returns a flat Python expression for the logical sentence in an
+        integer model, where bit indices[name] of model is the value of
+        symbol name. Its parts are referred to by the local variables
+        assigned by local, adding their lines to lines first.
+        """
+        raise Exception("nothing to evaluate")
+
+    def local(self, indices, lines, names):
+        """
+        Returns the name of a local variable holding the logical sentence's
+        value, appending the assignments that compute it to lines unless
+        names, which maps id(sentence) to its variable, already has it.
+        """
+        name = names.get(id(self))
+        if name is None:
+            value = self.expression(indices, lines, names)
+            name = f"v{len(names)}"
+            lines.append(f"    {name} = {value}")
+            names[id(self)] = name
+        return name
+
+    def returns(self, indices, lines, names):
+        """
+        Appends the lines that return the logical sentence's value,
+        as a bool, from straight-line source built by local.
+        """
+        lines.append(f"    return bool({self.local(indices, lines, names)})")
+
+    def table(self, columns, full):
+        """
+        Returns the logical sentence's column of a truth table: an integer
+        whose bit m is its value in model m, where columns[name] holds the
+        same for each symbol and full has a bit set for every model.
+        """
+        raise Exception("nothing to evaluate")
+
+    def compile(self, symbols=None):
+        """
+        Returns a function that evaluates the logical sentence in a model
+        given as an integer, where bit i is the value of the i-th name in
+        symbols (the sentence's own symbols in sorted order by default).
+        """
+        if symbols is None:
+            symbols = sorted(self.symbols())
+        indices = {name: i for i, name in enumerate(symbols)}
+
+        # one assignment per subsentence, so the source never nests deeply
+        lines = ["def compiled(model):"]
+        self.returns(indices, lines, {})
+        source = "\n".join(lines)
+        namespace = {}
+        exec(source, namespace)
+        return namespace["compiled"]
+
+    def freeze(self):
+        """
+        Returns the interned, immutable sentence equal to the logical sentence.
+        Equal interned sentences are the same object, so they compare in O(1),
+        and they share their parts, hash and symbols.
+        """
+        raise Exception("nothing to freeze")
+
     @classmethod
     def validate(cls, sentence):
         if not isinstance(sentence, Sentence):
@@ -43,11 +121,14 @@ class Sentence():
 
 
 class Symbol(Sentence):
+    __slots__ = ("name",)
 
     def __init__(self, name):
         self.name = name
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return isinstance(other, Symbol) and self.name == other.name
 
     def __hash__(self):
@@ -68,13 +149,32 @@ class Symbol(Sentence):
     def symbols(self):
         return {self.name}
 
+    def expression(self, indices, lines, names):
+        try:
+            return f"model >> {indices[self.name]} & 1"
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
+
+    def table(self, columns, full):
+        try:
+            return columns[self.name]
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
+
+    def freeze(self):
+        return interned_sentence(InternedSymbol, self.name)
+
 
 class Not(Sentence):
+    __slots__ = ("operand",)
+
     def __init__(self, operand):
         Sentence.validate(operand)
         self.operand = operand
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return isinstance(other, Not) and self.operand == other.operand
 
     def __hash__(self):
@@ -92,15 +192,36 @@ class Not(Sentence):
     def symbols(self):
         return self.operand.symbols()
 
+    def expression(self, indices, lines, names):
+        return f"not {self.operand.local(indices, lines, names)}"
+
+    def local(self, indices, lines, names):
+        # negating a variable costs less than assigning the result to another
+        operand = self.operand.local(indices, lines, names)
+        if operand.isidentifier():
+            return f"(not {operand})"
+        return super().local(indices, lines, names)
+
+    def table(self, columns, full):
+        return full ^ self.operand.table(columns, full)
+
+    def freeze(self):
+        return interned_sentence(InternedNot, self.operand.freeze())
+
 
 class And(Sentence):
+    __slots__ = ("conjuncts",)
+
     def __init__(self, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
         self.conjuncts = list(conjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        if self is other:
+            return True
+        return (isinstance(other, And)
+                and tuple(self.conjuncts) == tuple(other.conjuncts))
 
     def __hash__(self):
         return hash(
@@ -127,17 +248,46 @@ class And(Sentence):
                            for conjunct in self.conjuncts])
 
     def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+        return set().union(*[conjunct.symbols() for conjunct in self.conjuncts])
+
+    def expression(self, indices, lines, names):
+        conjuncts = [conjunct.local(indices, lines, names) for conjunct in self.conjuncts]
+        return " and ".join(conjuncts) or "True"
+
+    def returns(self, indices, lines, names):
+        # stop at the first conjunct that is false
+        if not self.conjuncts:
+            lines.append("    return True")
+            return
+        for conjunct in self.conjuncts[:-1]:
+            lines.append(f"    if not {conjunct.local(indices, lines, names)}: return False")
+        self.conjuncts[-1].returns(indices, lines, names)
+
+    def table(self, columns, full):
+        values = full
+        for conjunct in self.conjuncts:
+            values &= conjunct.table(columns, full)
+        return values
+
+    def freeze(self):
+        return interned_sentence(
+            InternedAnd, *[conjunct.freeze() for conjunct in self.conjuncts]
+        )
 
 
 class Or(Sentence):
+    __slots__ = ("disjuncts",)
+
     def __init__(self, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
         self.disjuncts = list(disjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        if self is other:
+            return True
+        return (isinstance(other, Or)
+                and tuple(self.disjuncts) == tuple(other.disjuncts))
 
     def __hash__(self):
         return hash(
@@ -158,10 +308,36 @@ class Or(Sentence):
                             for disjunct in self.disjuncts])
 
     def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+        return set().union(*[disjunct.symbols() for disjunct in self.disjuncts])
+
+    def expression(self, indices, lines, names):
+        disjuncts = [disjunct.local(indices, lines, names) for disjunct in self.disjuncts]
+        return " or ".join(disjuncts) or "False"
+
+    def returns(self, indices, lines, names):
+        # stop at the first disjunct that is true
+        if not self.disjuncts:
+            lines.append("    return False")
+            return
+        for disjunct in self.disjuncts[:-1]:
+            lines.append(f"    if {disjunct.local(indices, lines, names)}: return True")
+        self.disjuncts[-1].returns(indices, lines, names)
+
+    def table(self, columns, full):
+        values = 0
+        for disjunct in self.disjuncts:
+            values |= disjunct.table(columns, full)
+        return values
+
+    def freeze(self):
+        return interned_sentence(
+            InternedOr, *[disjunct.freeze() for disjunct in self.disjuncts]
+        )
 
 
 class Implication(Sentence):
+    __slots__ = ("antecedent", "consequent")
+
     def __init__(self, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
@@ -169,6 +345,8 @@ class Implication(Sentence):
         self.consequent = consequent
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return (isinstance(other, Implication)
                 and self.antecedent == other.antecedent
                 and self.consequent == other.consequent)
@@ -189,10 +367,27 @@ class Implication(Sentence):
         return f"{antecedent} => {consequent}"
 
     def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+        return set().union(self.antecedent.symbols(), self.consequent.symbols())
+
+    def expression(self, indices, lines, names):
+        antecedent = self.antecedent.local(indices, lines, names)
+        consequent = self.consequent.local(indices, lines, names)
+        return f"not {antecedent} or {consequent}"
+
+    def table(self, columns, full):
+        antecedent = self.antecedent.table(columns, full)
+        consequent = self.consequent.table(columns, full)
+        return (full ^ antecedent) | consequent
+
+    def freeze(self):
+        return interned_sentence(
+            InternedImplication, self.antecedent.freeze(), self.consequent.freeze()
+        )
 
 
 class Biconditional(Sentence):
+    __slots__ = ("left", "right")
+
     def __init__(self, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
@@ -200,6 +395,8 @@ class Biconditional(Sentence):
         self.right = right
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return (isinstance(other, Biconditional)
                 and self.left == other.left
                 and self.right == other.right)
@@ -222,42 +419,314 @@ class Biconditional(Sentence):
         return f"{left} <=> {right}"
 
     def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
+        return set().union(self.left.symbols(), self.right.symbols())
 
+    def expression(self, indices, lines, names):
+        left = self.left.local(indices, lines, names)
+        right = self.right.local(indices, lines, names)
+        return f"(not {left}) == (not {right})"
 
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+    def table(self, columns, full):
+        left = self.left.table(columns, full)
+        right = self.right.table(columns, full)
+        return full ^ (left ^ right)
 
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
+    def freeze(self):
+        return interned_sentence(
+            InternedBiconditional, self.left.freeze(), self.right.freeze()
+        )
 
-        # If model has an assignment for each symbol
-        if not symbols:
 
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
-            return True
+# every interned sentence still in use, by its class and parts
+interned = weakref.WeakValueDictionary()
+
+
+def interned_sentence(cls, *parts):
+    """
+    Returns the interned sentence of class cls made from parts, which are
+    themselves interned, creating it the first time it is asked for.
+    """
+    key = (cls, parts)
+    sentence = interned.get(key)
+    if sentence is None:
+        sentence = cls(*parts)
+        object.__setattr__(sentence, "cached_hash", super(Interned, sentence).__hash__())
+        interned[key] = sentence
+    return sentence
+
+
+class Interned():
+    """
+    Behaviour shared by interned sentences, made by Sentence.freeze. Each is
+    the only interned sentence with its structure, so two of them are equal
+    only if they are the same object. Hashes are worked out once, and
+    symbols the first time they are asked for.
+
+    Interned sentences cannot be changed, since their hash and their place
+    in the intern table depend on their parts, so their fields are set
+    with object.__setattr__ when they are made.
+    """
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise TypeError("interned sentences cannot be changed")
+
+    def __delattr__(self, name):
+        raise TypeError("interned sentences cannot be changed")
+
+    def __eq__(self, other):
+        if isinstance(other, Interned):
+            return self is other
+        return super().__eq__(other)
+
+    def __hash__(self):
+        return self.cached_hash
+
+    def symbols(self):
+        try:
+            return self.cached_symbols
+        except AttributeError:
+            object.__setattr__(self, "cached_symbols", frozenset(super().symbols()))
+            return self.cached_symbols
+
+    def freeze(self):
+        return self
+
+
+class InternedSymbol(Interned, Symbol):
+    __slots__ = ()
+
+    def __init__(self, name):
+        object.__setattr__(self, "name", name)
+
+
+class InternedNot(Interned, Not):
+    __slots__ = ()
+
+    def __init__(self, operand):
+        object.__setattr__(self, "operand", operand)
+
+
+class InternedAnd(Interned, And):
+    __slots__ = ()
+
+    def __init__(self, *conjuncts):
+        object.__setattr__(self, "conjuncts", conjuncts)
+
+    def add(self, conjunct):
+        raise TypeError("interned sentences cannot be changed")
+
+
+class InternedOr(Interned, Or):
+    __slots__ = ()
+
+    def __init__(self, *disjuncts):
+        object.__setattr__(self, "disjuncts", disjuncts)
+
+
+class InternedImplication(Interned, Implication):
+    __slots__ = ()
+
+    def __init__(self, antecedent, consequent):
+        object.__setattr__(self, "antecedent", antecedent)
+        object.__setattr__(self, "consequent", consequent)
+
+
+class InternedBiconditional(Interned, Biconditional):
+    __slots__ = ()
+
+    def __init__(self, left, right):
+        object.__setattr__(self, "left", left)
+        object.__setattr__(self, "right", right)
+
+
+class Encoding():
+    """
+    Tseitin encoding of sentences into clauses for a sat.Solver.
+
+    Each symbol and each compound subsentence gets a variable, with clauses
+    saying the variable is true exactly when the subsentence is, so the
+    clauses grow linearly with the sentence. Equal subsentences share one.
+    """
+
+    def __init__(self, solver):
+        self.solver = solver
+        self.literals = {}
+
+    def require(self, sentence):
+        """Adds clauses saying that sentence is true."""
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.require(conjunct)
+        elif isinstance(sentence, Or):
+            self.solver.add_clause([self.literal(disjunct) for disjunct in sentence.disjuncts])
+        else:
+            self.solver.add_clause([self.literal(sentence)])
+
+    def literal(self, sentence):
+        """Returns the literal that is true exactly when sentence is."""
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+        literal = self.literals.get(sentence)
+        if literal is None:
+            literal = self.define(sentence)
+            self.literals[sentence] = literal
+        return literal
+
+    def define(self, sentence):
+        """Returns a new variable, adding the clauses that define it as sentence."""
+        add_clause = self.solver.add_clause
+        if isinstance(sentence, Symbol):
+            return self.solver.new_variable()
+
+        if isinstance(sentence, And):
+            parts = [self.literal(conjunct) for conjunct in sentence.conjuncts]
+            v = self.solver.new_variable()
+            for part in parts:
+                add_clause([-v, part])
+            add_clause([v] + [-part for part in parts])
+        elif isinstance(sentence, Or):
+            parts = [self.literal(disjunct) for disjunct in sentence.disjuncts]
+            v = self.solver.new_variable()
+            for part in parts:
+                add_clause([v, -part])
+            add_clause([-v] + parts)
+        elif isinstance(sentence, Implication):
+            a = self.literal(sentence.antecedent)
+            c = self.literal(sentence.consequent)
+            v = self.solver.new_variable()
+            add_clause([-v, -a, c])
+            add_clause([v, a])
+            add_clause([v, -c])
+        elif isinstance(sentence, Biconditional):
+            a = self.literal(sentence.left)
+            b = self.literal(sentence.right)
+            v = self.solver.new_variable()
+            add_clause([-v, -a, b])
+            add_clause([-v, a, -b])
+            add_clause([v, a, b])
+            add_clause([v, -a, -b])
         else:
+            raise Exception(f"cannot encode {sentence}")
+        return v
+
+    def model(self, symbols):
+        """
+        Returns the solver's model as an integer whose bit i is the value of
+        the i-th name in symbols, leaving symbols never encoded false.
+        """
+        model = 0
+        for i, name in enumerate(symbols):
+            literal = self.literals.get(Symbol(name))
+            if literal is not None and self.solver.model[literal]:
+                model |= 1 << i
+        return model
+
+
+def sat_check(knowledge, query):
+    """
+    Checks if knowledge base entails query, by asking a SAT solver
+    whether knowledge and the negation of query can both be true.
+    """
+    return sat_check_many(knowledge, [query])[query]
+
+
+def sat_check_many(knowledge, queries):
+    """
+    Returns a dict saying whether knowledge base entails each query. The
+    knowledge base is encoded once, and each query is checked by solving
+    again with the query assumed false, keeping the clauses learned so far.
+
+    Every model found is a model of the knowledge base, so it also disproves
+    each query still open that is false in it, without solving for them.
+    """
+    solver = sat.Solver()
+    encoding = Encoding(solver)
+    encoding.require(knowledge)
+    symbols = sorted(knowledge.symbols().union(*[query.symbols() for query in queries]))
+    compiled = {query: query.compile(symbols) for query in queries}
+    entailed = dict.fromkeys(queries, True)
+    for query in entailed:
+        if not entailed[query]:
+            continue
+        if solver.solve([-encoding.literal(query)]):
+            model = encoding.model(symbols)
+            for other in entailed:
+                if entailed[other] and not compiled[other](model):
+                    entailed[other] = False
+    return entailed
+
+
+def truth_columns(symbols):
+    """
+    Yields (columns, full) for each chunk of the truth table of symbols,
+    where columns maps each symbol to an integer whose bit m is its value in
+    the chunk's model m and full has a bit set for every model in the chunk.
+    """
+    # the first symbols alternate within a chunk, in runs of 1, 2, 4, ... models
+    within = min(len(symbols), TABLE_CHUNK)
+    size = 2 ** within
+    full = (1 << size) - 1
+    columns = {}
+    for i, name in enumerate(symbols[:within]):
+        run = 2 ** i
+        repeat = full // ((1 << 2 * run) - 1)
+        columns[name] = (((1 << run) - 1) << run) * repeat
+
+    # the rest are constant within a chunk and count up from chunk to chunk
+    for chunk in range(2 ** (len(symbols) - within)):
+        for i, name in enumerate(symbols[within:]):
+            columns[name] = full if chunk >> i & 1 else 0
+        yield columns, full
+
+
+def table_check(knowledge, query, symbols):
+    """
+    Checks if knowledge base entails query, evaluating both in every model
+    of symbols at once as truth table columns.
+    """
+    return table_check_many(knowledge, [query], symbols)[query]
+
+
+def table_check_many(knowledge, queries, symbols):
+    """
+    Returns a dict saying whether knowledge base entails each query, working
+    out the knowledge base's truth table once for all of them.
+    """
+    entailed = dict.fromkeys(queries, True)
+    for columns, full in truth_columns(symbols):
+        models = knowledge.table(columns, full)
+        if not models:
+            continue
+
+        # a model where knowledge is true and query is false disproves it
+        for query in entailed:
+            if entailed[query] and models & ~query.table(columns, full):
+                entailed[query] = False
+
+        # nothing left to disprove
+        if not any(entailed.values()):
+            break
+    return entailed
+
 
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
+def model_check(knowledge, query):
+    """Checks if knowledge base entails query."""
+    return model_check_many(knowledge, [query])[query]
 
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
 
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
+def model_check_many(knowledge, queries):
+    """
+    Returns a dict saying whether knowledge base entails each query,
+    doing the work on the knowledge base once for all of them.
+    """
 
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
+    # Get all symbols in knowledge and every query
+    symbols = knowledge.symbols().union(*[query.symbols() for query in queries])
 
-    # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+    # Too many models to enumerate, so search for one where query is false instead
+    if len(symbols) > TABLE_LIMIT:
+        return sat_check_many(knowledge, queries)
 
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+    # Check that knowledge entails each query in every model, evaluating them all at once
+    return table_check_many(knowledge, queries, sorted(symbols))
@@ -0,0 +1,308 @@
+"""
+Conflict-driven clause learning SAT solver.
+
+Variables are positive integers and a literal is a variable, standing for
+the variable being true, or its negation, standing for it being false.
+"""
+
+import heapq
+
+# how much the bump given to variables in conflicts grows after each one,
+# so recent conflicts weigh more when choosing what to decide next
+ACTIVITY_GROWTH = 1 / 0.95
+
+# activity beyond which every activity is scaled back down
+ACTIVITY_LIMIT = 1e100
+
+# conflicts between restarts are this many times the Luby sequence 1, 1, 2, 1, 1, 2, 4, ...
+RESTART_UNIT = 100
+
+
+class Solver():
+    """
+    Decides whether a set of clauses can all be satisfied, using unit
+    propagation over two watched literals per clause, first-UIP clause
+    learning with backjumping, and activity-based decisions.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.clauses = []
+        self.watches = {}
+        self.units = []
+        self.unsat = False
+
+        # the current assignment: True or False for both literals of each
+        # assigned variable, its decision level and reason clause, and the
+        # literals made true, in order
+        self.truth = {}
+        self.level = {}
+        self.reason = {}
+        self.trail = []
+        self.trail_lim = []
+        self.head = 0
+
+        # decision heuristics: variables bumped in conflicts are tried first,
+        # with the value they last had
+        self.activity = {}
+        self.bump_size = 1.0
+        self.heap = []
+        self.phase = {}
+
+        self.model = None
+
+    def new_variable(self):
+        """Returns a new variable."""
+        self.count += 1
+        var = self.count
+        self.watches[var] = []
+        self.watches[-var] = []
+        self.activity[var] = 0.0
+        heapq.heappush(self.heap, (0.0, var))
+        return var
+
+    def add_clause(self, literals):
+        """
+        Adds the clause that at least one of literals is true.
+        Clauses may only be added between calls to solve.
+        """
+        clause = list(dict.fromkeys(literals))
+        if any(-literal in clause for literal in clause):
+            return
+        if not clause:
+            self.unsat = True
+        elif len(clause) == 1:
+            self.units.append(clause[0])
+        else:
+            self.watch(clause)
+
+    def solve(self, assumptions=()):
+        """
+        Returns True if the clauses can all be satisfied with every literal in
+        assumptions true, leaving a satisfying assignment in self.model, and
+        False if they cannot.
+
+        Assumptions only hold for this call, and clauses learned under them
+        stay valid without them, so the solver can be asked again and again.
+        """
+        self.model = None
+        if self.unsat:
+            return False
+        self.cancel_until(0)
+        self.cancel_level_zero()
+        for literal in self.units:
+            value = self.literal_value(literal)
+            if value is False:
+                self.unsat = True
+                return False
+            if value is None:
+                self.assign(literal, None)
+
+        restarts = 0
+        conflicts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+
+                # a conflict with no decisions made means there is no way out
+                if not self.trail_lim:
+                    self.unsat = True
+                    return False
+                learned, level = self.analyze(conflict)
+                self.cancel_until(level)
+                self.learn(learned)
+                self.bump_size *= ACTIVITY_GROWTH
+
+                # start the decisions over now and then, keeping what was learned
+                conflicts += 1
+                if conflicts >= RESTART_UNIT * luby(restarts):
+                    restarts += 1
+                    conflicts = 0
+                    self.cancel_until(0)
+            else:
+
+                # assume each assumption in turn, one decision level each
+                level = len(self.trail_lim)
+                if level < len(assumptions):
+                    literal = assumptions[level]
+                    value = self.literal_value(literal)
+                    if value is False:
+                        return False
+                    self.trail_lim.append(len(self.trail))
+                    if value is None:
+                        self.assign(literal, None)
+                    continue
+
+                var = self.pick()
+                if var is None:
+                    self.model = {var: self.truth[var] for var in range(1, self.count + 1)}
+                    return True
+                self.trail_lim.append(len(self.trail))
+                self.assign(var if self.phase.get(var, False) else -var, None)
+
+    def literal_value(self, literal):
+        """Returns True or False for an assigned literal, None otherwise."""
+        return self.truth.get(literal)
+
+    def assign(self, literal, reason):
+        var = abs(literal)
+        self.truth[literal] = True
+        self.truth[-literal] = False
+        self.level[var] = len(self.trail_lim)
+        self.reason[var] = reason
+        self.trail.append(literal)
+
+    def watch(self, clause):
+        """Stores a clause of two or more literals, watching its first two."""
+        index = len(self.clauses)
+        self.clauses.append(clause)
+        self.watches[clause[0]].append(index)
+        self.watches[clause[1]].append(index)
+        return index
+
+    def propagate(self):
+        """
+        Assigns every literal forced by a clause with only one literal left,
+        returning the index of a clause made false, or None if there is none.
+        """
+        truth = self.truth
+        clauses = self.clauses
+        watches = self.watches
+        while self.head < len(self.trail):
+            false_literal = -self.trail[self.head]
+            self.head += 1
+            watchers = watches[false_literal]
+            kept = []
+            for position, index in enumerate(watchers):
+                clause = clauses[index]
+
+                # keep the literal that just became false second
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], false_literal
+
+                # the clause is already satisfied by its other watch
+                first = truth.get(clause[0])
+                if first is True:
+                    kept.append(index)
+                    continue
+
+                # move the watch to another literal that is not false
+                for k in range(2, len(clause)):
+                    if truth.get(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        watches[clause[1]].append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if first is False:
+                        kept.extend(watchers[position + 1:])
+                        watches[false_literal] = kept
+                        return index
+                    self.assign(clause[0], index)
+            watches[false_literal] = kept
+        return None
+
+    def analyze(self, conflict):
+        """
+        Returns (clause, level): the clause learned from a conflict, which has
+        exactly one literal from the current decision level and starts with it,
+        and the level to jump back to, where that literal becomes forced.
+        """
+        level = len(self.trail_lim)
+        seen = set()
+        learned = [None]
+        pending = 0
+        clause = self.clauses[conflict]
+        position = len(self.trail)
+        while True:
+            for literal in clause:
+                var = abs(literal)
+                if var in seen or self.level[var] == 0:
+                    continue
+                seen.add(var)
+                self.bump(var)
+                if self.level[var] == level:
+                    pending += 1
+                else:
+                    learned.append(literal)
+
+            # resolve on the latest literal of this level still to be explained
+            while True:
+                position -= 1
+                literal = self.trail[position]
+                if abs(literal) in seen:
+                    break
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.clauses[self.reason[abs(literal)]]
+
+        learned[0] = -literal
+        if len(learned) == 1:
+            return learned, 0
+
+        # watch the literal from the latest level second, so the clause
+        # wakes up as soon as that level is undone
+        deepest = max(range(1, len(learned)), key=lambda i: self.level[abs(learned[i])])
+        learned[1], learned[deepest] = learned[deepest], learned[1]
+        return learned, self.level[abs(learned[1])]
+
+    def learn(self, clause):
+        """Adds a learned clause and assigns the literal it forces."""
+        if len(clause) == 1:
+            self.units.append(clause[0])
+            self.assign(clause[0], None)
+        else:
+            self.assign(clause[0], self.watch(clause))
+
+    def cancel_until(self, level):
+        """Undoes every assignment made above decision level."""
+        if len(self.trail_lim) <= level:
+            return
+        self.unassign(self.trail_lim[level])
+        del self.trail_lim[level:]
+
+    def cancel_level_zero(self):
+        """Undoes the assignments made without decisions too."""
+        self.unassign(0)
+
+    def unassign(self, start):
+        for literal in self.trail[start:]:
+            var = abs(literal)
+            self.phase[var] = literal > 0
+            del self.truth[literal]
+            del self.truth[-literal]
+            heapq.heappush(self.heap, (-self.activity[var], var))
+        del self.trail[start:]
+        self.head = len(self.trail)
+
+    def bump(self, var):
+        self.activity[var] += self.bump_size
+        if self.activity[var] > ACTIVITY_LIMIT:
+            for other in self.activity:
+                self.activity[other] /= ACTIVITY_LIMIT
+            self.bump_size /= ACTIVITY_LIMIT
+            self.heap = [(-self.activity[other], other) for other in self.activity
+                         if other not in self.truth]
+            heapq.heapify(self.heap)
+        elif var not in self.truth:
+            heapq.heappush(self.heap, (-self.activity[var], var))
+
+    def pick(self):
+        """Returns the unassigned variable with the most activity, or None."""
+        while self.heap:
+            activity, var = heapq.heappop(self.heap)
+            if var not in self.truth and -activity == self.activity[var]:
+                return var
+        return None
+
+
+def luby(i):
+    """Returns the i-th term, counting from 0, of the Luby sequence."""
+    size = 1
+    while size < i + 1:
+        size = 2 * size + 1
+    while size - 1 != i:
+        size //= 2
+        i %= size
+    return (size + 1) // 2